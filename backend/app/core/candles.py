@@ -0,0 +1,228 @@
+import asyncio
+import json
+import math
+import os
+import re
+import time
+from datetime import date, datetime, time as dt_time, timezone
+from typing import Optional
+import numpy as np
+from app.core.cache import KeyedLocks, TTLCache
+from app.core.config import settings
+from app.core.finnhub_client import get_stock_candles
+
+# Length of one candle per resolution; the newest candle is still forming until it has elapsed
+PERIOD_SECONDS = {
+    "1": 60,
+    "5": 300,
+    "15": 900,
+    "30": 1800,
+    "60": 3600,
+    "D": 86400,
+    "W": 7 * 86400,
+    "M": 31 * 86400,
+}
+CANDLE_DTYPE = np.dtype([
+    ("t", "<i8"),
+    ("o", "<f8"),
+    ("h", "<f8"),
+    ("l", "<f8"),
+    ("c", "<f8"),
+    ("v", "<f8"),
+])
+EMPTY = np.empty(0, dtype=CANDLE_DTYPE)
+# Symbols become directory names, so anything else (separators, "..") is refused
+SYMBOL_PATTERN = re.compile(r"^[A-Z0-9.\-:]+$")
+
+
+def to_epoch(value: date, end_of_day: bool = False) -> int:
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, dt_time.max if end_of_day else dt_time.min, tzinfo=timezone.utc)
+    elif value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def merge_ranges(ranges: list) -> list:
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def missing_ranges(covered: list, start: int, end: int) -> list:
+    gaps = []
+    cursor = start
+    for covered_start, covered_end in covered:
+        if covered_end < cursor:
+            continue
+        if covered_start > end:
+            break
+        if covered_start > cursor:
+            gaps.append((cursor, covered_start - 1))
+        cursor = max(cursor, covered_end + 1)
+    if cursor <= end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def candles_from_response(data: dict) -> np.ndarray:
+    # Finnhub answers {"s": "no_data"} for ranges with no trading (weekends, holidays)
+    if not data or data.get("s") != "ok":
+        return EMPTY
+    candles = np.empty(len(data["t"]), dtype=CANDLE_DTYPE)
+    for field in CANDLE_DTYPE.names:
+        candles[field] = data[field]
+    return candles
+
+
+class CandleStore:
+    """On-disk OHLCV series, one sorted structured array per (symbol, resolution).
+
+    Each series directory holds ``candles.npy`` (read back memory-mapped) and
+    ``coverage.json``, the merged epoch-second ranges already fetched, so a
+    range query only goes upstream for the parts it has never seen. Candles
+    that may still be forming are never marked covered; they are refetched at
+    most every ``tail_ttl`` seconds.
+
+    At most ``maxsize`` series stay mapped. Reads return copies, so an evicted
+    map is unreferenced and its file descriptor is released straight away.
+    """
+
+    def __init__(self, root: str, tail_ttl: float = 60.0, maxsize: int = 256):
+        self.root = root
+        self.tail_ttl = tail_ttl
+        # Plain LRUs: entries are replaced on write, never expired
+        self._arrays = TTLCache(maxsize, math.inf)
+        self._coverage = TTLCache(maxsize, math.inf)
+        self._locks = KeyedLocks()
+        # (symbol, resolution) -> settled cutoff of the last fetch of the open tail
+        self._tail = TTLCache(maxsize, tail_ttl)
+
+    def _directory(self, symbol: str, resolution: str) -> str:
+        if not SYMBOL_PATTERN.match(symbol) or symbol in (".", ".."):
+            raise ValueError(f"Invalid symbol: {symbol!r}")
+        return os.path.join(self.root, symbol, resolution)
+
+    def _path(self, symbol: str, resolution: str, name: str) -> str:
+        return os.path.join(self._directory(symbol, resolution), name)
+
+    def coverage(self, symbol: str, resolution: str) -> list:
+        key = (symbol, resolution)
+        covered = self._coverage.get(key)
+        if covered is None:
+            try:
+                with open(self._path(symbol, resolution, "coverage.json")) as f:
+                    covered = json.load(f)
+            except FileNotFoundError:
+                covered = []
+            self._coverage.set(key, covered)
+        return covered
+
+    def candles(self, symbol: str, resolution: str) -> np.ndarray:
+        key = (symbol, resolution)
+        candles = self._arrays.get(key)
+        if candles is None:
+            try:
+                candles = np.load(self._path(symbol, resolution, "candles.npy"), mmap_mode="r")
+            except FileNotFoundError:
+                candles = EMPTY
+            self._arrays.set(key, candles)
+        return candles
+
+    def read(self, symbol: str, resolution: str, start: int, end: int) -> np.ndarray:
+        # Only what is already on disk; no network
+        candles = self.candles(symbol, resolution)
+        lo = np.searchsorted(candles["t"], start, side="left")
+        hi = np.searchsorted(candles["t"], end, side="right")
+        # A copy, so callers never pin the map (and its descriptor) after eviction
+        return np.array(candles[lo:hi])
+
+    def _write(self, symbol: str, resolution: str, existing: np.ndarray, fetched: list, covered: list):
+        # Runs in a worker thread, so the caches are left to the caller
+        existing = np.asarray(existing)
+        combined = np.concatenate([*fetched, existing]) if fetched else existing
+        # Fetched rows come first, so on duplicate timestamps the fresh candle wins
+        _, first = np.unique(combined["t"], return_index=True)
+        combined = combined[first]
+
+        directory = self._directory(symbol, resolution)
+        os.makedirs(directory, exist_ok=True)
+        candles_path = self._path(symbol, resolution, "candles.npy")
+        coverage_path = self._path(symbol, resolution, "coverage.json")
+        with open(candles_path + ".tmp", "wb") as f:
+            np.save(f, combined)
+        with open(coverage_path + ".tmp", "w") as f:
+            json.dump(covered, f)
+        os.replace(candles_path + ".tmp", candles_path)
+        os.replace(coverage_path + ".tmp", coverage_path)
+
+    def _gaps(self, symbol: str, resolution: str, start: int, end: int) -> list:
+        gaps = missing_ranges(self.coverage(symbol, resolution), start, end)
+        settled = self._tail.get((symbol, resolution))
+        if settled is not None:
+            gaps = [(gap_start, gap_end) for gap_start, gap_end in gaps if gap_start <= settled]
+        return gaps
+
+    async def get_range(self, symbol: str, resolution: str, start: int, end: int) -> np.ndarray:
+        symbol = symbol.upper()
+        if resolution not in PERIOD_SECONDS:
+            raise ValueError(f"Unsupported resolution: {resolution}")
+        self._directory(symbol, resolution)
+        now = int(time.time())
+        end = min(end, now)
+
+        if self._gaps(symbol, resolution, start, end):
+            async with self._locks((symbol, resolution)):
+                # Re-check: another request may have filled the gaps while we waited
+                gaps = self._gaps(symbol, resolution, start, end)
+                if gaps:
+                    responses = await asyncio.gather(*(
+                        get_stock_candles(symbol, resolution, gap_start, gap_end)
+                        for gap_start, gap_end in gaps
+                    ))
+                    fetched = [candles_from_response(data) for data in responses]
+                    settled = now - PERIOD_SECONDS[resolution]
+                    covered = merge_ranges([
+                        *map(list, self.coverage(symbol, resolution)),
+                        *([gap_start, min(gap_end, settled)] for gap_start, gap_end in gaps if gap_start <= settled)
+                    ])
+                    existing = self.candles(symbol, resolution)
+                    await asyncio.to_thread(self._write, symbol, resolution, existing, fetched, covered)
+                    self._arrays.pop((symbol, resolution))
+                    self._coverage.set((symbol, resolution), covered)
+                    if gaps[-1][1] > settled:
+                        self._tail.set((symbol, resolution), settled)
+
+        return self.read(symbol, resolution, start, end)
+
+
+candle_store = CandleStore(
+    settings.CANDLE_STORE_DIR,
+    tail_ttl=settings.CANDLE_TAIL_TTL,
+    maxsize=settings.CANDLE_CACHE_MAX_ENTRIES
+)
+
+
+def candles_to_dict(candles: np.ndarray) -> dict:
+    return {field: candles[field].tolist() for field in CANDLE_DTYPE.names}
+
+
+async def get_candles(symbol: str, resolution: str, start: date, end: Optional[date] = None) -> np.ndarray:
+    end = end or datetime.now(timezone.utc)
+    return await candle_store.get_range(symbol, resolution, to_epoch(start), to_epoch(end, end_of_day=True))
+
+
+async def load_closes(symbols: list, start: date, end: date) -> list:
+    # Daily (timestamps, closes) per symbol, in order; a symbol with no candles gets empty arrays
+    semaphore = asyncio.Semaphore(settings.QUOTE_FANOUT_CONCURRENCY)
+
+    async def load(symbol: str):
+        async with semaphore:
+            candles = await get_candles(symbol, "D", start, end)
+        return np.asarray(candles["t"]), np.asarray(candles["c"])
+
+    return await asyncio.gather(*(load(symbol) for symbol in symbols))
@@ -6,7 +6,57 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    PRINCIPAL_CACHE_TTL: float = 60.0
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_EXECUTOR: str = "thread"  # "thread" or "process"
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 256  # 0 for unbounded
     FINNHUB_API_KEY: str
+    FINNHUB_BASE_URL: str = "https://finnhub.io/api/v1"
+    FINNHUB_TIMEOUT: float = 10.0
+    FINNHUB_MAX_CONNECTIONS: int = 20
+    FINNHUB_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    QUOTE_CACHE_TTL: float = 2.0
+    QUOTE_CACHE_MAX_ENTRIES: int = 5000
+    QUOTE_FANOUT_CONCURRENCY: int = 10
+    BATCH_QUOTE_MAX_SYMBOLS: int = 50
+    FINNHUB_WS_URL: str = "wss://ws.finnhub.io"
+    PRICE_STREAM_ENABLED: bool = True
+    PRICE_STREAM_RECONNECT_DELAY: float = 5.0
+    PRICE_BOOK_MAX_AGE: float = 60.0
+    PRICE_BOOK_BASE_TTL: float = 3600.0
+    SYMBOL_CACHE_TTL: float = 86400.0
+    SYMBOL_CACHE_MAX_ENTRIES: int = 20000
+    SYMBOL_INDEX_ENABLED: bool = True
+    SYMBOL_INDEX_EXCHANGE: str = "US"
+    SYMBOL_INDEX_PATH: str = "./data/symbols.json"
+    SYMBOL_INDEX_REFRESH_INTERVAL: float = 86400.0
+    IMPORT_BATCH_SIZE: int = 1000
+    IMPORT_MAX_ERRORS: int = 1000
+    EXPORT_CHUNK_SIZE: int = 1000
+    CANDLE_STORE_DIR: str = "./data/candles"
+    CANDLE_TAIL_TTL: float = 60.0
+    CANDLE_CACHE_MAX_ENTRIES: int = 256  # series kept memory-mapped (one file descriptor each)
+    RISK_BENCHMARK_SYMBOL: str = "SPY"
+    RISK_FREE_RATE: float = 0.0
+    RISK_CACHE_TTL: float = 3600.0
+    RISK_CACHE_MAX_ENTRIES: int = 1000
+    FUNDAMENTALS_CACHE_DIR: str = "./data/fundamentals"
+    FUNDAMENTALS_TTL: float = 86400.0
+    FUNDAMENTALS_MAX_STALE: float = 30 * 86400.0
+    FUNDAMENTALS_CACHE_MAX_ENTRIES: int = 2000
+    NEWS_REFRESH_ENABLED: bool = True
+    NEWS_REFRESH_INTERVAL: float = 300.0
+    NEWS_CATEGORIES: str = "general"  # comma-separated Finnhub news categories
+    NEWS_BUFFER_SIZE: int = 1000
+    FAST_SERIALIZATION: bool = False  # orjson responses and column-tuple serializers on hot reads
+    COMPRESSION_ENABLED: bool = False
+    COMPRESSION_MIN_SIZE: int = 1024
+    GZIP_LEVEL: int = 6
+    BROTLI_QUALITY: int = 4
+    METRICS_ENABLED: bool = True
+    LOT_METHOD: str = "FIFO"  # "FIFO", "LIFO" or "HIFO"
 
     class Config:
         extra = "allow"
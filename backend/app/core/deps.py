@@ -1,25 +1,49 @@
+import time
+from dataclasses import dataclass
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from app.core.database import SessionLocal
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import get_db
 from app.core.security import verify_token
 from app.models.user import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+@dataclass(frozen=True)
+class Principal:
+    # Detached snapshot of the authenticated user; safe to share between requests
+    id: int
+    username: str
+    email: str
+
+
+# token -> Principal; an entry never outlives the token's exp
+principal_cache = TTLCache(maxsize=settings.PRINCIPAL_CACHE_MAX_ENTRIES, ttl=settings.PRINCIPAL_CACHE_TTL)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_principal(mapper, connection, target):
+    principal_cache.discard_where(lambda principal: principal.id == target.id)
 
 
 async def get_current_user(
         token: str = Depends(oauth2_scheme),
-        db: Session = Depends(get_db)
-) -> User:
+        db: AsyncSession = Depends(get_db)
+) -> Principal:
+    return await get_user_from_token(token, db)
+
+
+async def get_user_from_token(token: str, db: AsyncSession) -> Principal:
+    # Shared by HTTP routes and websocket endpoints, which cannot use oauth2_scheme
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -34,8 +58,14 @@ async def get_current_user(
     if user_id is None:
         raise credentials_exception
 
-    user = db.query(User).filter(User.id == int(user_id)).first()
+    user = await db.get(User, int(user_id))
     if user is None:
         raise credentials_exception
 
-    return user
+    principal = Principal(id=user.id, username=user.username, email=user.email)
+    ttl = settings.PRINCIPAL_CACHE_TTL
+    if "exp" in payload:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        principal_cache.set(token, principal, ttl=ttl)
+    return principal
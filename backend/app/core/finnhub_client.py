@@ -1,42 +1,173 @@
+import time
+from typing import Optional
 import httpx
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.metrics import observe_finnhub
+from app.core.price_stream import price_book
 
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
-async def get_stock_quote(symbol: str):
-    url = f"https://finnhub.io/api/v1/quote?symbol={symbol}&token={settings.FINNHUB_API_KEY}"
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
+
+class FinnhubClient:
+    def __init__(
+            self,
+            api_key: str,
+            base_url: str = "https://finnhub.io/api/v1",
+            timeout: float = 10.0,
+            max_connections: int = 20,
+            max_keepalive_connections: int = 10,
+            keepalive_expiry: float = 30.0
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            http2=HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry
+            )
+        )
+
+    @classmethod
+    def from_settings(cls) -> "FinnhubClient":
+        return cls(
+            api_key=settings.FINNHUB_API_KEY,
+            base_url=settings.FINNHUB_BASE_URL,
+            timeout=settings.FINNHUB_TIMEOUT,
+            max_connections=settings.FINNHUB_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.FINNHUB_MAX_KEEPALIVE_CONNECTIONS
+        )
+
+    @property
+    def is_closed(self) -> bool:
+        return self._client.is_closed
+
+    async def close(self):
+        await self._client.aclose()
+
+    async def get(self, path: str, params: Optional[dict] = None, timeout: Optional[float] = None):
+        params = dict(params or {})
+        params["token"] = self.api_key
+        started = time.perf_counter()
+        status = "error"  # no HTTP response (timeout, connection failure)
+        try:
+            response = await self._client.get(
+                path,
+                params=params,
+                timeout=timeout if timeout is not None else self.timeout
+            )
+            status = str(response.status_code)
+        finally:
+            observe_finnhub(path, status, time.perf_counter() - started)
         response.raise_for_status()
         return response.json()
 
+    async def get_stock_quote(self, symbol: str, timeout: Optional[float] = None):
+        return await self.get("/quote", {"symbol": symbol}, timeout=timeout)
+
+    async def search_stocks(self, query: str, timeout: Optional[float] = None):
+        return await self.get("/search", {"q": query}, timeout=timeout)
+
+    async def get_company_profile(self, symbol: str, timeout: Optional[float] = None):
+        return await self.get("/stock/profile2", {"symbol": symbol}, timeout=timeout)
+
+    async def get_price_target(self, symbol: str, timeout: Optional[float] = None):
+        return await self.get("/stock/price-target", {"symbol": symbol}, timeout=timeout)
+
+    async def get_recommendation_trends(self, symbol: str, timeout: Optional[float] = None):
+        return await self.get("/stock/recommendation", {"symbol": symbol}, timeout=timeout)
+
+    async def get_market_news(self, category: str = "general", timeout: Optional[float] = None):
+        return await self.get("/news", {"category": category}, timeout=timeout)
+
+    async def get_stock_symbols(self, exchange: str = "US", timeout: Optional[float] = None):
+        return await self.get("/stock/symbol", {"exchange": exchange}, timeout=timeout)
+
+    async def get_stock_candles(
+            self,
+            symbol: str,
+            resolution: str,
+            start: int,
+            end: int,
+            timeout: Optional[float] = None
+    ):
+        return await self.get(
+            "/stock/candle",
+            {"symbol": symbol, "resolution": resolution, "from": start, "to": end},
+            timeout=timeout
+        )
+
+
+# Shared client, opened in main.py's startup hook and closed on shutdown
+_client: Optional[FinnhubClient] = None
+
+
+async def init_client() -> FinnhubClient:
+    return get_client()
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+# Short-lived quote cache shared by every caller of get_stock_quote
+quote_cache = TTLCache(maxsize=settings.QUOTE_CACHE_MAX_ENTRIES, ttl=settings.QUOTE_CACHE_TTL)
+
+
+def get_client() -> FinnhubClient:
+    # Scripts that never run the startup hook still get a (lazily created) client
+    global _client
+    if _client is None or _client.is_closed:
+        _client = FinnhubClient.from_settings()
+    return _client
+
+
+async def get_stock_quote(symbol: str):
+    # Prefer the live price from the trade stream when it is fresh
+    live_quote = price_book.quote(symbol)
+    if live_quote is not None:
+        return live_quote
+    quote = await quote_cache.get_or_load(symbol, lambda: get_client().get_stock_quote(symbol))
+    price_book.set_base(symbol, quote)
+    return quote
+
 
 async def search_stocks(query: str):
-    url = f"https://finnhub.io/api/v1/search?q={query}&token={settings.FINNHUB_API_KEY}"
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-        response.raise_for_status()
-        return response.json()
+    return await get_client().search_stocks(query)
 
 
 async def get_company_profile(symbol: str):
-    url = f"https://finnhub.io/api/v1/stock/profile2?symbol={symbol}&token={settings.FINNHUB_API_KEY}"
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-        response.raise_for_status()
-        return response.json()
+    return await get_client().get_company_profile(symbol)
 
 
 async def get_price_target(symbol: str):
-    url = f"https://finnhub.io/api/v1/stock/price-target?symbol={symbol}&token={settings.FINNHUB_API_KEY}"
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-        response.raise_for_status()
-        return response.json()
+    return await get_client().get_price_target(symbol)
 
 
 async def get_recommendation_trends(symbol: str):
-    url = f"https://finnhub.io/api/v1/stock/recommendation?symbol={symbol}&token={settings.FINNHUB_API_KEY}"
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url)
-        response.raise_for_status()
-        return response.json()
+    return await get_client().get_recommendation_trends(symbol)
+
+
+async def get_market_news(category: str = "general"):
+    return await get_client().get_market_news(category)
+
+
+async def get_stock_symbols(exchange: str = "US"):
+    # Tens of thousands of rows; allow longer than a normal call
+    return await get_client().get_stock_symbols(exchange, timeout=max(settings.FINNHUB_TIMEOUT, 60.0))
+
+
+async def get_stock_candles(symbol: str, resolution: str, start: int, end: int):
+    return await get_client().get_stock_candles(symbol, resolution, start, end)
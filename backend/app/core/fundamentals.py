@@ -0,0 +1,167 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+from app.core.config import settings
+from app.core.finnhub_client import get_company_profile, get_price_target, get_recommendation_trends
+
+logger = logging.getLogger(__name__)
+
+SOURCES = {
+    "profile": get_company_profile,
+    "price_target": get_price_target,
+    "recommendation_trends": get_recommendation_trends,
+}
+
+
+class StaleWhileRevalidateCache:
+    """Two-tier cache (in-memory LRU over one JSON file per key) for slow-changing data.
+
+    Entries younger than ``ttl`` are served as is. Older ones are still served
+    immediately while a single background refresh replaces them; only entries
+    past ``max_stale`` (or missing from both tiers) make the caller wait for
+    upstream. Timestamps are wall-clock so ages survive a restart.
+    """
+
+    def __init__(self, directory: str, ttl: float, max_stale: float, maxsize: int):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.refresh_failures = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key.replace(os.sep, '_')}.json")
+
+    def _read(self, key: str) -> Optional[tuple]:
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+            return entry["fetched_at"], entry["value"]
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError) as e:
+            logger.warning("Ignoring unreadable cache file for %s: %s", key, e)
+            return None
+
+    def _write(self, key: str, fetched_at: float, value: Any):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"fetched_at": fetched_at, "value": value}, f)
+        os.replace(path + ".tmp", path)
+
+    def _remember(self, key: str, fetched_at: float, value: Any):
+        self._data[key] = (fetched_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    async def _lookup(self, key: str) -> Optional[tuple]:
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+            return entry
+        entry = await asyncio.to_thread(self._read, key)
+        if entry is not None:
+            self.disk_hits += 1
+            self._remember(key, *entry)
+        return entry
+
+    def _refresh(self, key: str, loader: Callable[[Optional[Any]], Awaitable[Any]], previous: Optional[Any]):
+        # One refresh per key, however many requests find it stale
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader, previous))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    async def _load(self, key: str, loader: Callable[[Optional[Any]], Awaitable[Any]], previous: Optional[Any]) -> Any:
+        value = await loader(previous)
+        fetched_at = time.time()
+        self._remember(key, fetched_at, value)
+        await asyncio.to_thread(self._write, key, fetched_at, value)
+        return value
+
+    def _log_refresh_failure(self, key: str, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            self.refresh_failures += 1
+            logger.warning("Background refresh of %s failed: %s", key, task.exception())
+
+    async def get(self, key: str, loader: Callable[[Optional[Any]], Awaitable[Any]]) -> tuple:
+        """Returns (value, age in seconds); ``loader`` receives the previous value, if any."""
+        entry = await self._lookup(key)
+        if entry is not None:
+            fetched_at, value = entry
+            age = time.time() - fetched_at
+            if age < self.ttl:
+                self.hits += 1
+                return value, age
+            if age < self.max_stale:
+                self.stale_hits += 1
+                if key not in self._inflight:
+                    task = self._refresh(key, loader, value)
+                    task.add_done_callback(lambda t: self._log_refresh_failure(key, t))
+                return value, age
+
+        self.misses += 1
+        try:
+            value = await asyncio.shield(self._refresh(key, loader, entry and entry[1]))
+        except Exception:
+            if entry is None:
+                raise
+            # Too old to serve by choice, but better than nothing while upstream is down
+            return entry[1], time.time() - entry[0]
+        return value, 0.0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "max_stale": self.max_stale,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "refresh_failures": self.refresh_failures,
+            "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0
+        }
+
+
+fundamentals_cache = StaleWhileRevalidateCache(
+    settings.FUNDAMENTALS_CACHE_DIR,
+    ttl=settings.FUNDAMENTALS_TTL,
+    max_stale=settings.FUNDAMENTALS_MAX_STALE,
+    maxsize=settings.FUNDAMENTALS_CACHE_MAX_ENTRIES
+)
+
+
+async def _fetch_fundamentals(symbol: str, previous: Optional[dict]) -> dict:
+    responses = await asyncio.gather(*(fetch(symbol) for fetch in SOURCES.values()), return_exceptions=True)
+    if all(isinstance(response, Exception) for response in responses):
+        raise responses[0]
+    # A failed section keeps its previous value rather than blanking it
+    return {
+        name: (previous or {}).get(name) if isinstance(response, Exception) else response
+        for name, response in zip(SOURCES, responses)
+    }
+
+
+async def get_fundamentals(symbol: str) -> tuple:
+    symbol = symbol.upper()
+    return await fundamentals_cache.get(symbol, lambda previous: _fetch_fundamentals(symbol, previous))
@@ -0,0 +1,189 @@
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Optional
+import numpy as np
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import KeyedLocks
+from app.core.candles import load_closes, to_epoch
+from app.models.portfolio import PortfolioSnapshot, Transaction
+
+# One lock per portfolio so concurrent requests do not extend the same days twice.
+# Anything that invalidates snapshots holds it too, or an extension already waiting on
+# closes would persist days computed from the trades it read before the invalidation.
+history_locks = KeyedLocks()
+
+
+def _day_start(day: date) -> datetime:
+    # Transaction timestamps are stored as naive UTC
+    return datetime.combine(day, time.min)
+
+
+def value_series(
+        days: list,
+        symbols: list,
+        start_holdings: dict,
+        trades: list,
+        closes: list
+) -> tuple:
+    """Daily (value, net_flow) arrays over ``days`` for a portfolio replayed from trades.
+
+    ``trades`` holds (day_index, symbol, quantity, price) and ``closes`` one
+    (timestamps, closes) pair per symbol. Quantities and prices are n_days x
+    n_symbols matrices, so the cost is a handful of array operations. Also
+    returns the quantities and, per day, whether every held symbol had a close.
+    """
+    n_days, n_symbols = len(days), len(symbols)
+    column = {symbol: i for i, symbol in enumerate(symbols)}
+
+    deltas = np.zeros((n_days, n_symbols))
+    flows = np.zeros(n_days)
+    if trades:
+        day_index = np.array([trade[0] for trade in trades])
+        symbol_index = np.array([column[trade[1]] for trade in trades])
+        quantities = np.array([trade[2] for trade in trades], dtype=float)
+        prices = np.array([trade[3] for trade in trades], dtype=float)
+        np.add.at(deltas, (day_index, symbol_index), quantities)
+        flows = np.bincount(day_index, weights=quantities * prices, minlength=n_days)
+    start = np.array([start_holdings.get(symbol, 0.0) for symbol in symbols], dtype=float)
+    quantities = start + np.cumsum(deltas, axis=0)
+
+    # Close in effect at the end of each day (forward-filled over weekends and holidays)
+    day_ends = np.array([to_epoch(day, end_of_day=True) for day in days])
+    price_matrix = np.zeros((n_days, n_symbols))
+    for i, (t, c) in enumerate(closes):
+        idx = np.searchsorted(t, day_ends, side="right") - 1
+        valid = idx >= 0
+        price_matrix[valid, i] = c[idx[valid]]
+
+    values = (quantities * price_matrix).sum(axis=1)
+    priced = ((quantities <= 1e-9) | (price_matrix > 0)).all(axis=1)
+    return values, flows, quantities, priced
+
+
+def chain_twr(values: np.ndarray, flows: np.ndarray, previous_value: float, previous_index: float) -> np.ndarray:
+    # Daily return with flows at end of day: r_t = (V_t - F_t) / V_{t-1} - 1
+    prior = np.concatenate([[previous_value], values[:-1]])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.where(prior > 0, (values - flows) / prior - 1.0, 0.0)
+    return previous_index * np.cumprod(1.0 + returns)
+
+
+async def invalidate_snapshots(db: AsyncSession, portfolio_id: int, since: date):
+    # A back-dated trade changes every completed day from its date onwards
+    await db.execute(
+        delete(PortfolioSnapshot).where(
+            PortfolioSnapshot.portfolio_id == portfolio_id,
+            PortfolioSnapshot.date >= since
+        )
+    )
+
+
+async def _extend(db: AsyncSession, portfolio_id: int, today: date) -> Optional[dict]:
+    last = await db.scalar(
+        select(PortfolioSnapshot)
+        .filter(PortfolioSnapshot.portfolio_id == portfolio_id)
+        .order_by(PortfolioSnapshot.date.desc())
+        .limit(1)
+    )
+    if last is not None:
+        start = last.date + timedelta(days=1)
+        start_holdings = dict(last.holdings or {})
+        previous_value, previous_index = last.value, last.twr_index
+    else:
+        first_trade = await db.scalar(
+            select(Transaction.timestamp)
+            .filter(Transaction.portfolio_id == portfolio_id)
+            .order_by(Transaction.timestamp)
+            .limit(1)
+        )
+        if first_trade is None:
+            return None
+        start = first_trade.date()
+        start_holdings = {}
+        previous_value, previous_index = 0.0, 1.0
+    if start > today:
+        return None
+
+    rows = await db.execute(
+        select(Transaction.timestamp, Transaction.symbol, Transaction.quantity, Transaction.price)
+        .filter(Transaction.portfolio_id == portfolio_id, Transaction.timestamp >= _day_start(start))
+        .order_by(Transaction.timestamp, Transaction.id)
+    )
+    trades = [
+        ((timestamp.date() - start).days, symbol, quantity or 0.0, price or 0.0)
+        for timestamp, symbol, quantity, price in rows
+        if timestamp.date() <= today
+    ]
+
+    days = [start + timedelta(days=i) for i in range((today - start).days + 1)]
+    symbols = sorted(set(start_holdings) | {trade[1] for trade in trades})
+    # A week of lead-in so the first day has a close to carry forward
+    closes = await load_closes(symbols, start - timedelta(days=7), today)
+    values, flows, quantities, priced = value_series(days, symbols, start_holdings, trades, closes)
+    twr = chain_twr(values, flows, previous_value, previous_index)
+
+    # Only completed days are persisted; today's point is recomputed on every request.
+    # Persisting stops at the first day a held symbol has no close, so a gap in the
+    # candles is retried on the next request instead of being stored as a zero value.
+    unpriced = np.flatnonzero(~priced)
+    persist_until = days[unpriced[0]] if len(unpriced) else today
+    completed = [
+        {
+            "portfolio_id": portfolio_id,
+            "date": day,
+            "value": float(values[i]),
+            "net_flow": float(flows[i]),
+            "twr_index": float(twr[i]),
+            "holdings": {
+                symbol: float(quantity)
+                for symbol, quantity in zip(symbols, quantities[i])
+                if quantity > 1e-9
+            }
+        }
+        for i, day in enumerate(days) if day < persist_until
+    ]
+    if completed:
+        try:
+            await db.execute(insert(PortfolioSnapshot), completed)
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+
+    return {
+        "date": today.isoformat(),
+        "value": float(values[-1]),
+        "net_flow": float(flows[-1]),
+        "twr_index": float(twr[-1])
+    }
+
+
+async def portfolio_history(
+        db: AsyncSession,
+        portfolio_id: int,
+        start: Optional[date] = None,
+        end: Optional[date] = None
+) -> list:
+    today = datetime.now(timezone.utc).date()
+    async with history_locks(portfolio_id):
+        today_point = await _extend(db, portfolio_id, today)
+
+    query = select(
+        PortfolioSnapshot.date,
+        PortfolioSnapshot.value,
+        PortfolioSnapshot.net_flow,
+        PortfolioSnapshot.twr_index
+    ).filter(PortfolioSnapshot.portfolio_id == portfolio_id)
+    if start:
+        query = query.filter(PortfolioSnapshot.date >= start)
+    if end:
+        query = query.filter(PortfolioSnapshot.date <= end)
+    rows = await db.execute(query.order_by(PortfolioSnapshot.date))
+
+    series = [
+        {"date": day.isoformat(), "value": value, "net_flow": net_flow, "twr_index": twr_index}
+        for day, value, net_flow, twr_index in rows
+    ]
+    if today_point is not None and (start is None or start <= today) and (end is None or end >= today):
+        series.append(today_point)
+    return series
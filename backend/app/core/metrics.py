@@ -0,0 +1,254 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Iterable, Optional
+from sqlalchemy import event
+from starlette.routing import Match
+
+# Upper bounds in seconds; an implicit +Inf bucket follows
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Fixed buckets, counted into a list allocated once; observe is a bisect and three adds."""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Family:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._children = {}
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class HistogramFamily(_Family):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+
+    def labels(self, *values) -> Histogram:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = Histogram(self.buckets)
+        return child
+
+    def render(self) -> list:
+        lines = self.header()
+        for values, histogram in self._children.items():
+            cumulative = 0
+            for bound, count in zip((*histogram.bounds, float("inf")), histogram.counts):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(histogram.sum)}")
+            lines.append(f"{self.name}_count{labels} {histogram.count}")
+        return lines
+
+
+class GaugeFamily(_Family):
+    kind = "gauge"
+
+    def inc(self, *values, amount: float = 1):
+        self._children[values] = self._children.get(values, 0) + amount
+
+    def dec(self, *values, amount: float = 1):
+        self._children[values] = self._children.get(values, 0) - amount
+
+    def set(self, *values, value: float):
+        self._children[values] = value
+
+    def render(self) -> list:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}"
+            for values, value in self._children.items()
+        ]
+
+
+class CounterFamily(GaugeFamily):
+    kind = "counter"
+
+
+class Registry:
+    def __init__(self):
+        self._families = []
+        self._collectors = []
+
+    def register(self, family: _Family) -> _Family:
+        self._families.append(family)
+        return family
+
+    def register_collector(self, collector: Callable[[], Iterable[_Family]]):
+        # For values owned elsewhere (cache stats, pool depth), read only when scraped
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for family in self._families:
+            lines.extend(family.render())
+        for collector in self._collectors:
+            for family in collector():
+                lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests_in_flight = registry.register(GaugeFamily(
+    "http_requests_in_flight", "Requests currently being handled.", ("method", "route")
+))
+http_request_duration = registry.register(HistogramFamily(
+    "http_request_duration_seconds", "Time to the end of the response body.", ("method", "route", "status")
+))
+finnhub_request_duration = registry.register(HistogramFamily(
+    "finnhub_request_duration_seconds", "Finnhub REST calls by path and HTTP status.", ("path", "status")
+))
+sql_statement_duration = registry.register(HistogramFamily(
+    "sql_statement_duration_seconds", "Cursor execution time of each SQL statement."
+))
+sql_statements_per_request = registry.register(HistogramFamily(
+    "http_request_sql_statements", "SQL statements issued per request.", ("method", "route"), QUERY_COUNT_BUCKETS
+))
+sql_time_per_request = registry.register(HistogramFamily(
+    "http_request_sql_seconds", "Total SQL cursor time per request.", ("method", "route")
+))
+password_hash_duration = registry.register(HistogramFamily(
+    "password_hash_duration_seconds", "bcrypt hash/verify time in the worker, excluding queueing."
+))
+
+
+class RequestSQL:
+    __slots__ = ("statements", "seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+
+# Set for the duration of each HTTP request; SQLAlchemy's greenlets inherit it
+_request_sql: ContextVar[Optional[RequestSQL]] = ContextVar("request_sql", default=None)
+
+
+def observe_finnhub(path: str, status: str, seconds: float):
+    finnhub_request_duration.labels(path, status).observe(seconds)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    sql_statement_duration.labels().observe(elapsed)
+    request_sql = _request_sql.get()
+    if request_sql is not None:
+        request_sql.statements += 1
+        request_sql.seconds += elapsed
+
+
+def instrument_engine(engine):
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, in-flight requests and SQL usage per route template.
+
+    The route is resolved before the request runs so the in-flight gauge can
+    carry it; templates (not raw paths) keep label cardinality bounded.
+    """
+
+    def __init__(self, app, routes: list, cache_size: int = 4096):
+        self.app = app
+        self.routes = routes
+        self.cache_size = cache_size
+        self._route_cache = {}
+
+    def _route(self, scope) -> str:
+        key = (scope["method"], scope["path"])
+        template = self._route_cache.get(key)
+        if template is None:
+            template = "unmatched"
+            for route in self.routes:
+                match, _ = route.matches(scope)
+                if match == Match.FULL:
+                    template = route.path
+                    break
+                if match == Match.PARTIAL and template == "unmatched":
+                    template = route.path
+            if len(self._route_cache) >= self.cache_size:
+                self._route_cache.clear()
+            self._route_cache[key] = template
+        return template
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._route(scope)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        request_sql = RequestSQL()
+        token = _request_sql.set(request_sql)
+        http_requests_in_flight.inc(method, route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec(method, route)
+            _request_sql.reset(token)
+            http_request_duration.labels(method, route, str(status)).observe(elapsed)
+            sql_statements_per_request.labels(method, route).observe(request_sql.statements)
+            sql_time_per_request.labels(method, route).observe(request_sql.seconds)
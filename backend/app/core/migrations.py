@@ -0,0 +1,316 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, bindparam, func, inspect, select, text
+from sqlalchemy.engine import Connection
+from app.core.database import Base
+from app.core.positions import EPSILON, LotQueue, get_lot_method, open_lot
+import app.models  # noqa: F401 (registers every table on Base.metadata)
+
+# Kept out of Base.metadata so create_all/drop_all never touch it
+migration_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String),
+    Column("applied_at", DateTime(timezone=True)),
+)
+
+
+def _create_index(conn: Connection, table_name: str, index_name: str):
+    table = Base.metadata.tables[table_name]
+    index = next(index for index in table.indexes if index.name == index_name)
+    index.create(conn, checkfirst=True)
+
+
+def _add_column(conn: Connection, table_name: str, column_name: str, ddl: str):
+    columns = {column["name"] for column in inspect(conn).get_columns(table_name)}
+    if column_name not in columns:
+        conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {ddl}"))
+
+
+# Every migration is idempotent: a fresh database gets the current schema from version 1
+# and the later steps find nothing left to do.
+
+def _baseline(conn: Connection):
+    Base.metadata.create_all(conn, checkfirst=True)
+
+
+def _positions_ledger(conn: Connection):
+    _add_column(conn, "stocks", "average_cost", "FLOAT DEFAULT 0")
+    _add_column(conn, "stocks", "updated_at", "DATETIME")
+
+
+def _transaction_keyset_index(conn: Connection):
+    _create_index(conn, "transactions", "ix_transactions_portfolio_timestamp_id")
+
+
+def _hot_lookup_indexes(conn: Connection):
+    # Merge duplicate positions and drop duplicate watchlist rows so the unique indexes can be built
+    conn.execute(text(
+        "UPDATE stocks SET quantity = ("
+        " SELECT SUM(s2.quantity) FROM stocks s2"
+        " WHERE s2.portfolio_id = stocks.portfolio_id AND s2.symbol = stocks.symbol"
+        ") WHERE id IN ("
+        " SELECT MIN(id) FROM stocks GROUP BY portfolio_id, symbol HAVING COUNT(*) > 1"
+        ")"
+    ))
+    conn.execute(text(
+        "DELETE FROM stocks WHERE id NOT IN (SELECT MIN(id) FROM stocks GROUP BY portfolio_id, symbol)"
+    ))
+    conn.execute(text(
+        "DELETE FROM watchlists WHERE id NOT IN (SELECT MIN(id) FROM watchlists GROUP BY user_id, symbol)"
+    ))
+    _create_index(conn, "stocks", "ux_stocks_portfolio_symbol")
+    _create_index(conn, "watchlists", "ux_watchlists_user_symbol")
+    _create_index(conn, "portfolios", "ix_portfolios_user_id")
+
+
+def _portfolio_snapshots(conn: Connection):
+    Base.metadata.tables["portfolio_snapshots"].create(conn, checkfirst=True)
+    _create_index(conn, "portfolio_snapshots", "ux_portfolio_snapshots_portfolio_date")
+
+
+def _tax_lots(conn: Connection):
+    for table_name in ("tax_lots", "lot_disposals"):
+        Base.metadata.tables[table_name].create(conn, checkfirst=True)
+    _create_index(conn, "tax_lots", "ix_tax_lots_portfolio_symbol_opened")
+    _create_index(conn, "lot_disposals", "ix_lot_disposals_portfolio_symbol")
+    if conn.execute(text("SELECT 1 FROM tax_lots LIMIT 1")).first():
+        return
+
+    # Backfill by replaying existing history in FIFO order, one (portfolio, symbol) at a time
+    method = get_lot_method("FIFO")
+    lots, disposals = [], []
+    open_lots, current = None, None
+    transactions = Base.metadata.tables["transactions"]
+    rows = conn.execute(
+        select(
+            transactions.c.portfolio_id,
+            transactions.c.symbol,
+            transactions.c.quantity,
+            transactions.c.price,
+            transactions.c.timestamp
+        ).order_by(
+            transactions.c.portfolio_id, transactions.c.symbol, transactions.c.timestamp, transactions.c.id
+        )
+    )
+    for portfolio_id, symbol, quantity, price, timestamp in rows:
+        if (portfolio_id, symbol) != current:
+            open_lots, current = LotQueue(method), (portfolio_id, symbol)
+        quantity, price = quantity or 0.0, price or 0.0
+        if quantity > 0:
+            lot = open_lot(portfolio_id, symbol, quantity, price, timestamp)
+            lot.id = len(lots) + 1
+            lots.append(lot)
+            open_lots.push(lot)
+        else:
+            disposals.extend(open_lots.consume(-quantity, price, timestamp))
+
+    if lots:
+        conn.execute(Base.metadata.tables["tax_lots"].insert(), [
+            {
+                "id": lot.id,
+                "portfolio_id": lot.portfolio_id,
+                "symbol": lot.symbol,
+                "quantity": lot.quantity,
+                "remaining": lot.remaining,
+                "cost_per_share": lot.cost_per_share,
+                "opened_at": lot.opened_at
+            }
+            for lot in lots
+        ])
+    if disposals:
+        conn.execute(Base.metadata.tables["lot_disposals"].insert(), [
+            {
+                "portfolio_id": disposal.portfolio_id,
+                "lot_id": lot.id,
+                "symbol": disposal.symbol,
+                "quantity": disposal.quantity,
+                "cost_basis": disposal.cost_basis,
+                "proceeds": disposal.proceeds,
+                "opened_at": disposal.opened_at,
+                "closed_at": disposal.closed_at
+            }
+            for lot, disposal in disposals
+        ])
+
+
+def _resource_versions(conn: Connection):
+    _add_column(conn, "portfolios", "version", "INTEGER NOT NULL DEFAULT 0")
+    _add_column(conn, "users", "portfolios_version", "INTEGER NOT NULL DEFAULT 0")
+    _add_column(conn, "users", "watchlist_version", "INTEGER NOT NULL DEFAULT 0")
+
+
+def _open_lot_indexes(conn: Connection):
+    # (portfolio_id, symbol, remaining) sorted every sell's open lots in a temp b-tree
+    conn.execute(text("DROP INDEX IF EXISTS ix_tax_lots_portfolio_symbol_remaining"))
+    _create_index(conn, "tax_lots", "ix_tax_lots_portfolio_symbol_opened")
+    # Rounding leftovers count as consumed; the partial indexes only hold remaining > 0
+    conn.execute(text("UPDATE tax_lots SET remaining = 0 WHERE remaining <= 1e-9"))
+    _create_index(conn, "tax_lots", "ix_tax_lots_open_by_age")
+    _create_index(conn, "tax_lots", "ix_tax_lots_open_by_cost")
+
+
+def _reconcile_tax_lots(conn: Connection):
+    # Legacy positions were written to stocks without transactions, so the replay in
+    # _tax_lots can disagree with them. Positions win: missing quantity is opened as a lot
+    # at the last known trade price, surplus lots are consumed oldest first (a ledger
+    # correction, not a sale, so no disposals are recorded).
+    stocks = Base.metadata.tables["stocks"]
+    tax_lots = Base.metadata.tables["tax_lots"]
+    transactions = Base.metadata.tables["transactions"]
+    held = {
+        (portfolio_id, symbol): quantity or 0.0
+        for portfolio_id, symbol, quantity in conn.execute(
+            select(stocks.c.portfolio_id, stocks.c.symbol, stocks.c.quantity)
+        )
+    }
+    open_quantity = {
+        (portfolio_id, symbol): remaining
+        for portfolio_id, symbol, remaining in conn.execute(
+            select(tax_lots.c.portfolio_id, tax_lots.c.symbol, func.sum(tax_lots.c.remaining))
+            .where(tax_lots.c.remaining > 0)
+            .group_by(tax_lots.c.portfolio_id, tax_lots.c.symbol)
+        )
+    }
+
+    now = datetime.now(timezone.utc)
+    new_lots, updates = [], []
+    for key in sorted(set(held) | set(open_quantity)):
+        portfolio_id, symbol = key
+        difference = held.get(key, 0.0) - open_quantity.get(key, 0.0)
+        if difference > EPSILON:
+            price = conn.execute(
+                select(transactions.c.price)
+                .where(transactions.c.portfolio_id == portfolio_id, transactions.c.symbol == symbol)
+                .order_by(transactions.c.timestamp.desc(), transactions.c.id.desc())
+                .limit(1)
+            ).scalar()
+            # Unexplained holdings predate the recorded history
+            opened_at = conn.execute(
+                select(func.min(transactions.c.timestamp)).where(transactions.c.portfolio_id == portfolio_id)
+            ).scalar()
+            new_lots.append({
+                "portfolio_id": portfolio_id,
+                "symbol": symbol,
+                "quantity": difference,
+                "remaining": difference,
+                "cost_per_share": price or 0.0,
+                "opened_at": opened_at or now
+            })
+        elif difference < -EPSILON:
+            surplus = -difference
+            lots = conn.execute(
+                select(tax_lots.c.id, tax_lots.c.remaining)
+                .where(
+                    tax_lots.c.portfolio_id == portfolio_id,
+                    tax_lots.c.symbol == symbol,
+                    tax_lots.c.remaining > 0
+                )
+                .order_by(tax_lots.c.opened_at, tax_lots.c.id)
+            )
+            for lot_id, remaining in lots:
+                if surplus <= EPSILON:
+                    break
+                taken = min(remaining, surplus)
+                surplus -= taken
+                left = remaining - taken
+                updates.append({"lot_id": lot_id, "remaining": left if left > EPSILON else 0.0})
+
+    if new_lots:
+        conn.execute(tax_lots.insert(), new_lots)
+    if updates:
+        conn.execute(
+            tax_lots.update().where(tax_lots.c.id == bindparam("lot_id")).values(remaining=bindparam("remaining")),
+            updates
+        )
+
+    # _positions_ledger left average_cost at 0 on legacy rows; take it from the open lots
+    conn.execute(text(
+        "UPDATE stocks SET average_cost = ("
+        " SELECT SUM(remaining * cost_per_share) / SUM(remaining) FROM tax_lots"
+        " WHERE tax_lots.portfolio_id = stocks.portfolio_id AND tax_lots.symbol = stocks.symbol"
+        " AND tax_lots.remaining > 0"
+        ") WHERE (average_cost IS NULL OR average_cost = 0) AND EXISTS ("
+        " SELECT 1 FROM tax_lots"
+        " WHERE tax_lots.portfolio_id = stocks.portfolio_id AND tax_lots.symbol = stocks.symbol"
+        " AND tax_lots.remaining > 0"
+        ")"
+    ))
+
+
+MIGRATIONS = [
+    (1, "baseline schema", _baseline),
+    (2, "positions ledger columns on stocks", _positions_ledger),
+    (3, "transactions (portfolio_id, timestamp, id) index", _transaction_keyset_index),
+    (4, "composite and unique indexes for hot lookups", _hot_lookup_indexes),
+    (5, "daily portfolio value snapshots", _portfolio_snapshots),
+    (6, "tax lot ledger, backfilled FIFO from transactions", _tax_lots),
+    (7, "version counters for conditional GETs", _resource_versions),
+    (8, "tax lot indexes serving lot-method order", _open_lot_indexes),
+    (9, "tax lots and average costs reconciled with legacy positions", _reconcile_tax_lots),
+]
+
+
+def current_version(conn: Connection) -> int:
+    schema_migrations.create(conn, checkfirst=True)
+    latest = conn.execute(
+        select(schema_migrations.c.version).order_by(schema_migrations.c.version.desc()).limit(1)
+    ).scalar()
+    return latest or 0
+
+
+def run_migrations(conn: Connection) -> list:
+    version = current_version(conn)
+    applied = []
+    for migration_version, description, migrate in MIGRATIONS:
+        if migration_version <= version:
+            continue
+        migrate(conn)
+        conn.execute(schema_migrations.insert().values(
+            version=migration_version,
+            description=description,
+            applied_at=datetime.now(timezone.utc)
+        ))
+        applied.append((migration_version, description))
+    return applied
+
+
+# Queries on the request path that must be answered from an index (SQLite EXPLAIN QUERY PLAN)
+HOT_QUERIES = {
+    "position by portfolio and symbol": "SELECT * FROM stocks WHERE portfolio_id = 1 AND symbol = 'AAPL'",
+    "positions by portfolio": "SELECT * FROM stocks WHERE portfolio_id IN (1, 2)",
+    "watchlist entry by user and symbol": "SELECT * FROM watchlists WHERE user_id = 1 AND symbol = 'AAPL'",
+    "watchlist by user": "SELECT * FROM watchlists WHERE user_id = 1",
+    "transactions by portfolio": (
+        "SELECT * FROM transactions WHERE portfolio_id = 1 ORDER BY timestamp DESC, id DESC LIMIT 50"
+    ),
+    "portfolios by user": "SELECT * FROM portfolios WHERE user_id = 1",
+    "snapshots by portfolio": "SELECT * FROM portfolio_snapshots WHERE portfolio_id = 1 ORDER BY date",
+    # The open-lot reads of a sell, one per lot method (app.core.positions.LOT_METHODS)
+    "open lots FIFO": (
+        "SELECT * FROM tax_lots WHERE portfolio_id = 1 AND symbol = 'AAPL' AND remaining > 0"
+        " ORDER BY opened_at, id"
+    ),
+    "open lots LIFO": (
+        "SELECT * FROM tax_lots WHERE portfolio_id = 1 AND symbol = 'AAPL' AND remaining > 0"
+        " ORDER BY opened_at DESC, id DESC"
+    ),
+    "open lots HIFO": (
+        "SELECT * FROM tax_lots WHERE portfolio_id = 1 AND symbol = 'AAPL' AND remaining > 0"
+        " ORDER BY cost_per_share DESC, opened_at, id"
+    ),
+    "realized gains by portfolio": "SELECT * FROM lot_disposals WHERE portfolio_id = 1",
+}
+
+
+def explain_hot_queries(conn: Connection) -> dict:
+    plans = {}
+    for name, query in HOT_QUERIES.items():
+        details = [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {query}"))]
+        # A full SCAN or a temp b-tree sort means the lookup is not served by an index
+        uses_index = not any(
+            detail.startswith("SCAN") or "TEMP B-TREE" in detail for detail in details
+        )
+        plans[name] = (uses_index, details)
+    return plans
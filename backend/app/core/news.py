@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Optional
+from app.core.config import settings
+from app.core.finnhub_client import get_market_news
+
+logger = logging.getLogger(__name__)
+
+
+class NewsFeed:
+    """Most recent market news, shared by every user and refreshed in the background.
+
+    Articles from each polled category are deduplicated by id into one
+    bounded buffer, newest first. ``version`` changes whenever the buffer
+    does; it also encodes the start time so tags never repeat across restarts.
+    """
+
+    def __init__(self, categories: list, maxlen: int, interval: float, retry_delay: float = 60.0):
+        self.categories = categories
+        self.interval = interval
+        self.retry_delay = retry_delay
+        self._items: deque = deque(maxlen=maxlen)
+        self._ids: set = set()
+        self._generation = 0
+        self._started = int(time.time())
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.fetched_at = 0.0
+        # Monotonic time and error of the last failed refresh, to back off while upstream is down
+        self._failed_at: Optional[float] = None
+        self._last_error: Optional[Exception] = None
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def version(self) -> str:
+        return f"{self._started:x}-{self._generation}"
+
+    def merge(self, articles: list) -> int:
+        # Once full, anything older than the oldest held article would be evicted straight away
+        oldest = (self._items[-1].get("datetime") or 0) if len(self._items) == self._items.maxlen else None
+        fresh = [
+            article for article in articles
+            if article.get("id") is not None and article["id"] not in self._ids
+            and (oldest is None or (article.get("datetime") or 0) > oldest)
+        ]
+        if not fresh:
+            return 0
+        for article in fresh:
+            self._ids.add(article["id"])
+        # Upstream pages are newest first but not necessarily newer than what we hold
+        ordered = sorted([*fresh, *self._items], key=lambda article: article.get("datetime") or 0, reverse=True)
+        self._items = deque(ordered[:self._items.maxlen], maxlen=self._items.maxlen)
+        if len(ordered) > len(self._items):
+            self._ids = {article["id"] for article in self._items}
+        self._generation += 1
+        return len(fresh)
+
+    def page(self, category: Optional[str] = None, offset: int = 0, limit: int = 100) -> list:
+        items = self._items
+        if category:
+            category = category.lower()
+            items = (article for article in items if (article.get("category") or "").lower() == category)
+        result = []
+        for i, article in enumerate(items):
+            if i >= offset + limit:
+                break
+            if i >= offset:
+                result.append(article)
+        return result
+
+    async def _refresh(self):
+        try:
+            responses = await asyncio.gather(*(get_market_news(category) for category in self.categories))
+        except Exception as e:
+            self._failed_at, self._last_error = time.monotonic(), e
+            raise
+        self._failed_at = self._last_error = None
+        added = sum(self.merge(articles or []) for articles in responses)
+        self.fetched_at = time.time()
+        if added:
+            logger.info("Market news refreshed: %d new articles", added)
+
+    async def refresh(self):
+        async with self._lock:
+            await self._refresh()
+
+    async def ensure_loaded(self):
+        # Without the background task (or before its first poll), the first reader fetches for everyone.
+        # After a failure, readers get the same error until retry_delay has passed instead of each going upstream.
+        if not self.fetched_at:
+            async with self._lock:
+                if not self.fetched_at:
+                    if self._failed_at is not None and time.monotonic() - self._failed_at < self.retry_delay:
+                        raise self._last_error
+                    await self._refresh()
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Market news refresh failed: %s", e)
+                await asyncio.sleep(self.retry_delay)
+                continue
+            await asyncio.sleep(self.interval)
+
+
+news_feed = NewsFeed(
+    [category.strip() for category in settings.NEWS_CATEGORIES.split(",") if category.strip()],
+    maxlen=settings.NEWS_BUFFER_SIZE,
+    interval=settings.NEWS_REFRESH_INTERVAL
+)
@@ -0,0 +1,254 @@
+import heapq
+import itertools
+from datetime import datetime, timezone
+from typing import Callable, NamedTuple, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import KeyedLocks
+from app.core.config import settings
+from app.models.portfolio import LotDisposal, Stock, TaxLot, Transaction
+
+# Quantities below this are treated as a closed position (float rounding)
+EPSILON = 1e-9
+
+OPENED = "opened"
+CLOSED = "closed"
+
+# Holdings are read, checked and written back across awaits, so every write path takes its
+# portfolio's lock from before the read until after the commit; otherwise concurrent sells
+# could each pass the holdings check against the same shares
+portfolio_locks = KeyedLocks()
+
+
+class InsufficientHoldings(Exception):
+    def __init__(self, symbol: str, current: float, requested: float):
+        self.symbol = symbol
+        self.current = current
+        self.requested = requested
+        super().__init__(f"Insufficient holdings. Current: {current}, Requested: {requested}")
+
+
+def apply_fill(symbol: str, held: float, average_cost: float, quantity: float, price: float):
+    # quantity is signed: positive for buys, negative for sells.
+    # Buys move the average cost; sells reduce quantity at the existing average cost.
+    if quantity >= 0:
+        new_quantity = held + quantity
+        if new_quantity <= EPSILON:
+            return 0.0, 0.0
+        return new_quantity, (held * average_cost + quantity * price) / new_quantity
+
+    if held + EPSILON < -quantity:
+        raise InsufficientHoldings(symbol, held, -quantity)
+    new_quantity = held + quantity
+    if new_quantity <= EPSILON:
+        return 0.0, 0.0
+    return new_quantity, average_cost
+
+
+async def apply_transaction(
+        db: AsyncSession,
+        portfolio_id: int,
+        symbol: str,
+        quantity: float,
+        price: float
+):
+    # Updates the position row in the caller's unit of work; the caller commits
+    # populate_existing: a row already in the session may predate another request's commit
+    position = await db.scalar(
+        select(Stock).filter(
+            Stock.portfolio_id == portfolio_id,
+            Stock.symbol == symbol
+        ).limit(1).execution_options(populate_existing=True)
+    )
+    held = position.quantity if position else 0.0
+    average_cost = (position.average_cost or 0.0) if position else 0.0
+    new_quantity, new_average_cost = apply_fill(symbol, held, average_cost, quantity, price)
+
+    change = None
+    now = datetime.now(timezone.utc)
+    if position is None:
+        if new_quantity <= EPSILON:
+            return None, None
+        position = Stock(
+            portfolio_id=portfolio_id,
+            symbol=symbol,
+            quantity=new_quantity,
+            average_cost=new_average_cost,
+            updated_at=now
+        )
+        db.add(position)
+        # Flush so a second trade in the same unit of work finds this row
+        await db.flush()
+        change = OPENED
+    elif new_quantity <= EPSILON:
+        await db.delete(position)
+        change = CLOSED
+    else:
+        position.quantity = new_quantity
+        position.average_cost = new_average_cost
+        position.updated_at = now
+    return position, change
+
+
+def _lot_age(lot: TaxLot) -> tuple:
+    opened_at = lot.opened_at
+    if opened_at is None:
+        seconds = float("inf")
+    else:
+        if opened_at.tzinfo is None:
+            opened_at = opened_at.replace(tzinfo=timezone.utc)
+        seconds = opened_at.timestamp()
+    # Lots not yet flushed have no id and count as newer than stored lots opened in the same second
+    return seconds, lot.id if lot.id is not None else float("inf")
+
+
+def _newest_first(lot: TaxLot) -> tuple:
+    seconds, lot_id = _lot_age(lot)
+    return -seconds, -lot_id
+
+
+class LotMethod(NamedTuple):
+    key: Callable  # Priority of an open lot; the smallest key is consumed first
+    order_by: tuple  # The same order in SQL
+
+
+# Pluggable lot matching for sells
+LOT_METHODS = {
+    "FIFO": LotMethod(_lot_age, (TaxLot.opened_at, TaxLot.id)),
+    "LIFO": LotMethod(_newest_first, (TaxLot.opened_at.desc(), TaxLot.id.desc())),
+    "HIFO": LotMethod(
+        lambda lot: (-(lot.cost_per_share or 0.0), *_lot_age(lot)),
+        (TaxLot.cost_per_share.desc(), TaxLot.opened_at, TaxLot.id)
+    ),
+}
+
+
+def get_lot_method(name: Optional[str] = None) -> LotMethod:
+    name = (name or settings.LOT_METHOD).upper()
+    if name not in LOT_METHODS:
+        raise ValueError(f"Unknown lot method: {name}")
+    return LOT_METHODS[name]
+
+
+def open_lot(portfolio_id: int, symbol: str, quantity: float, price: float, opened_at: datetime) -> TaxLot:
+    return TaxLot(
+        portfolio_id=portfolio_id,
+        symbol=symbol,
+        quantity=quantity,
+        remaining=quantity,
+        cost_per_share=price,
+        opened_at=opened_at
+    )
+
+
+class LotQueue:
+    # Open lots of one symbol in a heap ordered by the lot method, so a sell costs
+    # O(lots closed * log n) however long the position's history is
+    def __init__(self, method: LotMethod, lots=()):
+        self.method = method
+        self._heap = []
+        self._sequence = itertools.count()
+        for lot in lots:
+            self.push(lot)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, lot: TaxLot):
+        heapq.heappush(self._heap, (self.method.key(lot), next(self._sequence), lot))
+
+    def consume(self, quantity: float, price: float, closed_at: datetime) -> list:
+        # Returns (lot, LotDisposal) pairs; the caller sets lot_id once the lot has one
+        disposals = []
+        left = quantity
+        while left > EPSILON and self._heap:
+            lot = self._heap[0][2]
+            taken = min(lot.remaining, left)
+            lot.remaining -= taken
+            left -= taken
+            if lot.remaining <= EPSILON:
+                # Exactly 0, so the lot drops out of the partial open-lot indexes
+                lot.remaining = 0.0
+                heapq.heappop(self._heap)
+            if taken <= EPSILON:
+                continue
+            disposals.append((lot, LotDisposal(
+                portfolio_id=lot.portfolio_id,
+                symbol=lot.symbol,
+                quantity=taken,
+                cost_basis=taken * (lot.cost_per_share or 0.0),
+                proceeds=taken * price,
+                opened_at=lot.opened_at,
+                closed_at=closed_at
+            )))
+        return disposals
+
+
+async def apply_lots(
+        db: AsyncSession,
+        portfolio_id: int,
+        symbol: str,
+        quantity: float,
+        price: float,
+        lot_method: Optional[str] = None
+):
+    # Buys open a lot; sells close open lots in lot-method order
+    now = datetime.now(timezone.utc)
+    if quantity > 0:
+        db.add(open_lot(portfolio_id, symbol, quantity, price, now))
+        return
+    method = get_lot_method(lot_method)
+    if db.new:
+        # Make lots opened earlier in this unit of work visible to the query
+        await db.flush()
+
+    # Read open lots in consumption order only until the sell is covered; "remaining > 0"
+    # matches the partial indexes on tax_lots, which serve each method's order
+    lots = LotQueue(method)
+    covered = 0.0
+    result = await db.stream_scalars(
+        select(TaxLot)
+        .filter(
+            TaxLot.portfolio_id == portfolio_id,
+            TaxLot.symbol == symbol,
+            TaxLot.remaining > 0
+        )
+        .order_by(*method.order_by)
+        .execution_options(yield_per=100, populate_existing=True)
+    )
+    async for lot in result:
+        lots.push(lot)
+        covered += lot.remaining
+        if covered + EPSILON >= -quantity:
+            break
+    await result.close()
+
+    for lot, disposal in lots.consume(-quantity, price, now):
+        disposal.lot_id = lot.id
+        db.add(disposal)
+
+
+async def record_trade(
+        db: AsyncSession,
+        portfolio_id: int,
+        symbol: str,
+        quantity: float,
+        price: float,
+        transaction_type: Optional[str] = None,
+        lot_method: Optional[str] = None
+):
+    # The single write path for holdings: the transaction row, the position and its tax lots move together.
+    # Callers hold portfolio_locks(portfolio_id) through their commit.
+    if transaction_type is not None and transaction_type != ("BUY" if quantity >= 0 else "SELL"):
+        raise ValueError(f"{transaction_type} does not match the sign of quantity {quantity}")
+    position, change = await apply_transaction(db, portfolio_id, symbol, quantity, price)
+    await apply_lots(db, portfolio_id, symbol, quantity, price, lot_method)
+    db_transaction = Transaction(
+        portfolio_id=portfolio_id,
+        symbol=symbol,
+        quantity=quantity,
+        price=price,
+        type=transaction_type or ("BUY" if quantity >= 0 else "SELL")
+    )
+    db.add(db_transaction)
+    return db_transaction, position, change
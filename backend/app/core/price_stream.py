@@ -0,0 +1,232 @@
+import asyncio
+import json
+import logging
+import time
+from collections import Counter
+from typing import Iterable, Optional
+from sqlalchemy import func, select
+from app.core.config import settings
+from app.models.portfolio import Stock
+from app.models.watchlist import Watchlist
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+logger = logging.getLogger(__name__)
+
+
+class PriceListener:
+    """Collects price changes for one consumer, keeping only the latest per symbol.
+
+    A slow consumer therefore never builds a backlog: it sees the newest price
+    of every symbol that moved since it last called ``wait``.
+    """
+
+    def __init__(self):
+        self._pending: dict[str, tuple[float, float]] = {}
+        self._event = asyncio.Event()
+
+    def notify(self, symbol: str, price: float, timestamp: float):
+        self._pending[symbol] = (price, timestamp)
+        self._event.set()
+
+    async def wait(self) -> dict:
+        await self._event.wait()
+        self._event.clear()
+        pending, self._pending = self._pending, {}
+        return pending
+
+
+class PriceBook:
+    """Last traded price per symbol, fed by the trade websocket.
+
+    A REST quote ("base") is kept per symbol so a live price can be returned in
+    the same shape as Finnhub's /quote response.
+    """
+
+    def __init__(self, max_age: float, base_ttl: float):
+        self.max_age = max_age
+        self.base_ttl = base_ttl
+        self._prices: dict[str, tuple[float, float]] = {}  # symbol -> (price, unix seconds)
+        self._bases: dict[str, tuple[float, dict]] = {}  # symbol -> (monotonic fetched at, quote)
+        self._listeners: dict[str, set[PriceListener]] = {}
+
+    def __len__(self) -> int:
+        return len(self._prices)
+
+    def update(self, symbol: str, price: float, timestamp: float) -> bool:
+        current = self._prices.get(symbol)
+        if current is not None and current[1] > timestamp:
+            return False
+        self._prices[symbol] = (price, timestamp)
+        if current is None or current[0] != price:
+            for listener in self._listeners.get(symbol, ()):
+                listener.notify(symbol, price, timestamp)
+        return True
+
+    def listen(self, symbols: Iterable[str], listener: PriceListener):
+        for symbol in symbols:
+            self._listeners.setdefault(symbol, set()).add(listener)
+
+    def unlisten(self, symbols: Iterable[str], listener: PriceListener):
+        for symbol in symbols:
+            listeners = self._listeners.get(symbol)
+            if listeners is not None:
+                listeners.discard(listener)
+                if not listeners:
+                    del self._listeners[symbol]
+
+    def get(self, symbol: str) -> Optional[tuple[float, float]]:
+        return self._prices.get(symbol)
+
+    def discard(self, symbol: str):
+        self._prices.pop(symbol, None)
+        self._bases.pop(symbol, None)
+
+    def set_base(self, symbol: str, quote: dict):
+        if quote and not quote.get('error') and quote.get('pc'):
+            self._bases[symbol] = (time.monotonic(), quote)
+
+    def quote(self, symbol: str) -> Optional[dict]:
+        live = self._prices.get(symbol)
+        base = self._bases.get(symbol)
+        if live is None or base is None:
+            return None
+        price, timestamp = live
+        fetched_at, base_quote = base
+        if time.time() - timestamp > self.max_age or time.monotonic() - fetched_at > self.base_ttl:
+            return None
+
+        previous_close = base_quote['pc']
+        change = price - previous_close
+        return {
+            **base_quote,
+            "c": price,
+            "d": change,
+            "dp": change / previous_close * 100,
+            "h": max(base_quote.get('h') or price, price),
+            "l": min(base_quote.get('l') or price, price),
+            "t": int(timestamp)
+        }
+
+
+class PriceStream:
+    """Background task that keeps the price book subscribed to held and watched symbols.
+
+    Symbols are reference counted (one per stock row or watchlist entry) so a
+    symbol is only unsubscribed once nobody holds or watches it.
+    """
+
+    def __init__(self, url: str, api_key: str, book: PriceBook, reconnect_delay: float = 5.0):
+        self.url = url
+        self.api_key = api_key
+        self.book = book
+        self.reconnect_delay = reconnect_delay
+        self._symbols: Counter = Counter()
+        self._ws = None
+        self._task: Optional[asyncio.Task] = None
+        self.trades_received = 0
+
+    @property
+    def symbols(self) -> set:
+        return set(self._symbols)
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None
+
+    async def start(self, symbol_counts: dict):
+        self._symbols.update(symbol_counts)
+        if websockets is None:
+            logger.warning("websockets is not installed; real-time price stream disabled")
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def track(self, symbols: Iterable[str]):
+        for symbol in symbols:
+            self._symbols[symbol] += 1
+            if self._symbols[symbol] == 1:
+                await self._send("subscribe", symbol)
+
+    async def untrack(self, symbols: Iterable[str]):
+        for symbol in symbols:
+            if self._symbols[symbol] <= 1:
+                del self._symbols[symbol]
+                self.book.discard(symbol)
+                await self._send("unsubscribe", symbol)
+            else:
+                self._symbols[symbol] -= 1
+
+    async def _send(self, message_type: str, symbol: str):
+        ws = self._ws
+        if ws is None:
+            # Subscriptions are replayed in full on (re)connect
+            return
+        try:
+            await ws.send(json.dumps({"type": message_type, "symbol": symbol}))
+        except Exception as e:
+            logger.warning("Failed to %s %s: %s", message_type, symbol, e)
+
+    def handle_message(self, raw) -> int:
+        message = json.loads(raw)
+        if message.get("type") != "trade":
+            return 0
+        updated = 0
+        for trade in message.get("data") or ():
+            symbol = trade.get("s")
+            price = trade.get("p")
+            if symbol not in self._symbols or price is None:
+                continue
+            # Finnhub trade timestamps are in milliseconds
+            if self.book.update(symbol, float(price), trade.get("t", 0) / 1000):
+                updated += 1
+        self.trades_received += updated
+        return updated
+
+    async def _run(self):
+        url = f"{self.url}?token={self.api_key}"
+        while True:
+            try:
+                async with websockets.connect(url) as ws:
+                    self._ws = ws
+                    for symbol in list(self._symbols):
+                        await ws.send(json.dumps({"type": "subscribe", "symbol": symbol}))
+                    async for raw in ws:
+                        self.handle_message(raw)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Price stream disconnected: %s", e)
+            finally:
+                self._ws = None
+            await asyncio.sleep(self.reconnect_delay)
+
+
+async def tracked_symbol_counts(db) -> dict:
+    counts = Counter()
+    for model in (Stock, Watchlist):
+        result = await db.execute(select(model.symbol, func.count()).group_by(model.symbol))
+        for symbol, count in result:
+            counts[symbol] += count
+    return dict(counts)
+
+
+price_book = PriceBook(max_age=settings.PRICE_BOOK_MAX_AGE, base_ttl=settings.PRICE_BOOK_BASE_TTL)
+price_stream = PriceStream(
+    url=settings.FINNHUB_WS_URL,
+    api_key=settings.FINNHUB_API_KEY,
+    book=price_book,
+    reconnect_delay=settings.PRICE_STREAM_RECONNECT_DELAY
+)
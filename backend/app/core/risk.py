@@ -0,0 +1,138 @@
+import hashlib
+from datetime import date, timedelta
+from typing import Optional
+import numpy as np
+from app.core.cache import TTLCache
+from app.core.candles import load_closes
+from app.core.config import settings
+
+TRADING_DAYS = 252
+
+risk_cache = TTLCache(maxsize=settings.RISK_CACHE_MAX_ENTRIES, ttl=settings.RISK_CACHE_TTL)
+
+
+class InsufficientHistory(ValueError):
+    pass
+
+
+def holdings_version(holdings: dict) -> str:
+    # Stands in for a stored portfolio version: changes whenever the positions do
+    raw = ";".join(f"{symbol}={quantity!r}" for symbol, quantity in sorted(holdings.items()))
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def align_closes(series: list) -> tuple:
+    """Aligns (timestamps, closes) pairs on their union of timestamps.
+
+    Returns (timestamps, prices) where prices is a T x N matrix, forward-filled
+    and trimmed to the first row on which every series has a price.
+    """
+    timestamps = np.unique(np.concatenate([t for t, _ in series]))
+    prices = np.full((len(timestamps), len(series)), np.nan)
+    for column, (t, closes) in enumerate(series):
+        # Index of the latest candle at or before each timestamp (forward fill)
+        idx = np.searchsorted(t, timestamps, side="right") - 1
+        valid = idx >= 0
+        prices[valid, column] = closes[idx[valid]]
+    complete = ~np.isnan(prices).any(axis=1)
+    if not complete.any():
+        return timestamps[:0], prices[:0]
+    first = np.argmax(complete)
+    return timestamps[first:], prices[first:]
+
+
+def _round_or_none(value, digits: int = 6):
+    return None if value is None or not np.isfinite(value) else round(float(value), digits)
+
+
+def compute_risk(symbols: list, quantities: np.ndarray, prices: np.ndarray, benchmark: np.ndarray,
+                 risk_free_rate: float = 0.0) -> dict:
+    """Risk/return statistics for a buy-and-hold of the current quantities.
+
+    ``prices`` is T x N (one column per symbol), ``benchmark`` has length T.
+    """
+    if len(prices) < 3:
+        raise InsufficientHistory("Not enough overlapping price history")
+
+    returns = prices[1:] / prices[:-1] - 1.0
+    benchmark_returns = benchmark[1:] / benchmark[:-1] - 1.0
+
+    values = prices @ quantities
+    portfolio_returns = values[1:] / values[:-1] - 1.0
+    weights = prices[-1] * quantities / values[-1]
+
+    daily_risk_free = risk_free_rate / TRADING_DAYS
+    mean_return = portfolio_returns.mean()
+    volatility = portfolio_returns.std(ddof=1)
+    drawdowns = values / np.maximum.accumulate(values) - 1.0
+
+    # Betas for the portfolio and every holding at once: cov(r, rb) / var(rb)
+    benchmark_centered = benchmark_returns - benchmark_returns.mean()
+    benchmark_variance = benchmark_centered @ benchmark_centered
+    holding_centered = returns - returns.mean(axis=0)
+    holding_betas = benchmark_centered @ holding_centered / benchmark_variance
+    portfolio_beta = benchmark_centered @ (portfolio_returns - mean_return) / benchmark_variance
+
+    holding_volatility = returns.std(axis=0, ddof=1) * np.sqrt(TRADING_DAYS)
+    correlation = np.corrcoef(returns, rowvar=False) if len(symbols) > 1 else np.ones((1, 1))
+
+    return {
+        "observations": int(len(portfolio_returns)),
+        "total_return": _round_or_none(values[-1] / values[0] - 1.0),
+        "annualized_return": _round_or_none(mean_return * TRADING_DAYS),
+        "annualized_volatility": _round_or_none(volatility * np.sqrt(TRADING_DAYS)),
+        "sharpe_ratio": _round_or_none(
+            (mean_return - daily_risk_free) / volatility * np.sqrt(TRADING_DAYS) if volatility else None
+        ),
+        "max_drawdown": _round_or_none(drawdowns.min()),
+        "beta": _round_or_none(portfolio_beta if benchmark_variance else None),
+        "holdings": [
+            {
+                "symbol": symbol,
+                "weight": _round_or_none(weight),
+                "annualized_volatility": _round_or_none(vol),
+                "beta": _round_or_none(beta if benchmark_variance else None)
+            }
+            for symbol, weight, vol, beta in zip(symbols, weights, holding_volatility, holding_betas)
+        ],
+        "correlation": {
+            "symbols": symbols,
+            "matrix": [[_round_or_none(value) for value in row] for row in correlation]
+        }
+    }
+
+
+async def portfolio_risk(
+        portfolio_id: int,
+        holdings: dict,
+        benchmark: str,
+        as_of: date,
+        lookback_days: int,
+        risk_free_rate: float = 0.0,
+        version: Optional[str] = None
+) -> dict:
+    symbols = sorted(holdings)
+    if not symbols:
+        raise InsufficientHistory("Portfolio has no holdings")
+    version = version or holdings_version(holdings)
+
+    async def compute():
+        start = as_of - timedelta(days=lookback_days)
+        series = await load_closes([*symbols, benchmark], start, as_of)
+        for symbol, (timestamps, _) in zip([*symbols, benchmark], series):
+            if not len(timestamps):
+                raise InsufficientHistory(f"No price history for {symbol}")
+        timestamps, prices = align_closes(series)
+        quantities = np.array([holdings[symbol] for symbol in symbols], dtype=float)
+        result = compute_risk(symbols, quantities, prices[:, :-1], prices[:, -1], risk_free_rate)
+        return {
+            "portfolio_id": portfolio_id,
+            "as_of": as_of.isoformat(),
+            "benchmark": benchmark,
+            "lookback_days": lookback_days,
+            "risk_free_rate": risk_free_rate,
+            **result
+        }
+
+    key = (portfolio_id, version, as_of, benchmark, lookback_days, risk_free_rate)
+    return await risk_cache.get_or_load(key, compute)
@@ -0,0 +1,116 @@
+import json
+from datetime import date, datetime
+from typing import Any, Optional
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.portfolio import Portfolio, Stock, Transaction
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Column order matches the Pydantic schemas, so both paths produce the same JSON
+STOCK_COLUMNS = (Stock.symbol, Stock.quantity, Stock.id, Stock.portfolio_id, Stock.average_cost, Stock.updated_at)
+TRANSACTION_COLUMNS = (
+    Transaction.symbol,
+    Transaction.quantity,
+    Transaction.type,
+    Transaction.id,
+    Transaction.portfolio_id,
+    Transaction.price,
+    Transaction.timestamp
+)
+
+
+def json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        # OPT_UTC_Z: aware UTC datetimes end in "Z", as Pydantic writes them
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z)
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":"), default=json_default
+    ).encode("utf-8")
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    for token in accept_encoding.split(","):
+        name, _, params = token.partition(";")
+        if name.strip() == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (when installed) from already-plain data.
+
+    Given the request's Accept-Encoding, bodies of at least COMPRESSION_MIN_SIZE
+    bytes are brotli-compressed here; otherwise GZipMiddleware (main.py) may
+    gzip them on the way out.
+    """
+
+    def __init__(self, content: Any, status_code: int = 200, headers: Optional[dict] = None,
+                 accept_encoding: str = "", **kwargs):
+        super().__init__(content, status_code=status_code, headers=headers, **kwargs)
+        if (
+                brotli is not None
+                and settings.COMPRESSION_ENABLED
+                and len(self.body) >= settings.COMPRESSION_MIN_SIZE
+                and _accepts(accept_encoding, "br")
+        ):
+            self.body = brotli.compress(self.body, quality=settings.BROTLI_QUALITY)
+            self.headers["Content-Encoding"] = "br"
+            self.headers["Content-Length"] = str(len(self.body))
+            self.headers.add_vary_header("Accept-Encoding")
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+async def portfolio_payloads(
+        db: AsyncSession,
+        user_id: int,
+        portfolio_id: Optional[int] = None,
+        include_transactions: bool = True,
+        limit: Optional[int] = None
+) -> list:
+    """The user's portfolios as plain dicts in the PortfolioSchema shape.
+
+    Reads column tuples (one query per table, like the selectin loads) and
+    skips ORM identity-map bookkeeping and Pydantic validation entirely.
+    """
+    query = select(Portfolio.id, Portfolio.name, Portfolio.user_id).filter(Portfolio.user_id == user_id)
+    if portfolio_id is not None:
+        query = query.filter(Portfolio.id == portfolio_id)
+    if limit is not None:
+        query = query.limit(limit)
+    portfolios = {
+        id_: {"name": name, "id": id_, "user_id": owner_id, "stocks": [], "transactions": []}
+        for id_, name, owner_id in await db.execute(query)
+    }
+    if not portfolios:
+        return []
+
+    collections = [("stocks", Stock, STOCK_COLUMNS)]
+    if include_transactions:
+        collections.append(("transactions", Transaction, TRANSACTION_COLUMNS))
+    for key, model, columns in collections:
+        names = [column.key for column in columns]
+        portfolio_index = names.index("portfolio_id")
+        # Same WHERE as the selectin loads, so rows come back in the same (index) order
+        rows = await db.execute(select(*columns).filter(model.portfolio_id.in_(list(portfolios))))
+        for row in rows.tuples():
+            portfolios[row[portfolio_index]][key].append(dict(zip(names, row)))
+    return list(portfolios.values())
@@ -0,0 +1,206 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from bisect import bisect_left
+from typing import Optional
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.finnhub_client import get_stock_quote, get_stock_symbols
+
+logger = logging.getLogger(__name__)
+
+WORD = re.compile(r"[a-z0-9]+")
+FIELDS = ("symbol", "description", "displaySymbol", "type")
+
+
+def normalize_symbol(symbol: str) -> str:
+    # The one form symbols are stored and compared in, whatever casing upstream or callers use
+    return (symbol or "").strip().upper()
+
+
+def _deletes(term: str) -> set:
+    # Every way of dropping one character; two terms within one edit share a variant
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+class SymbolIndex:
+    """In-memory index over the exchange's symbol list for typeahead and validation.
+
+    Symbol and description-word prefixes are answered by bisecting sorted lists;
+    typos (one insert, delete or substitution) through a map of one-character
+    deletions built once per load.
+    """
+
+    def __init__(self, path: str, exchange: str):
+        self.path = path
+        self.exchange = exchange
+        self.swap(({}, [], [], [], {}), 0.0)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, symbol: str) -> bool:
+        return normalize_symbol(symbol) in self._entries
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self._entries)
+
+    @staticmethod
+    def build(entries: list) -> tuple:
+        # CPU-bound for a full exchange; callers on the event loop run it in a thread
+        compact = {}
+        for entry in entries:
+            symbol = normalize_symbol(entry.get("symbol"))
+            if symbol:
+                compact[symbol] = {field: entry.get(field) or "" for field in FIELDS}
+                compact[symbol]["symbol"] = symbol
+
+        words = set()
+        typos = {}
+        for symbol, entry in compact.items():
+            for word in WORD.findall(entry["description"].lower()):
+                words.add((word, symbol))
+            for variant in _deletes(symbol) | {symbol}:
+                typos.setdefault(variant, []).append(symbol)
+        words = sorted(words)
+        return compact, sorted(compact), [word for word, _ in words], [symbol for _, symbol in words], typos
+
+    def swap(self, built: tuple, fetched_at: Optional[float] = None):
+        # Runs on the event loop, so a search never sees a half-replaced index
+        self._entries, self._symbols, self._words, self._word_symbols, self._typos = built
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+
+    def load(self, entries: list, fetched_at: Optional[float] = None):
+        self.swap(self.build(entries), fetched_at)
+
+    @staticmethod
+    def _prefix_range(keys: list, prefix: str, limit: int) -> range:
+        start = end = bisect_left(keys, prefix)
+        while end < len(keys) and end - start < limit and keys[end].startswith(prefix):
+            end += 1
+        return range(start, end)
+
+    def search(self, query: str, limit: int = 20) -> dict:
+        # Same shape as Finnhub's /search response
+        term = normalize_symbol(query)
+        if not term:
+            return {"count": 0, "result": []}
+
+        ranked = {}
+
+        def add(symbols):
+            for symbol in symbols:
+                if len(ranked) >= limit:
+                    return
+                ranked.setdefault(symbol, None)
+
+        if term in self._entries:
+            add([term])
+        # Scan a little past the limit so shorter symbols can be ranked first
+        matches = self._prefix_range(self._symbols, term, limit * 5)
+        add(sorted((self._symbols[i] for i in matches), key=len))
+        for word in WORD.findall(query.lower())[:1]:
+            add(self._word_symbols[i] for i in self._prefix_range(self._words, word, limit))
+        if len(ranked) < limit and len(term) > 1:
+            candidates = set()
+            for variant in _deletes(term) | {term}:
+                candidates.update(self._typos.get(variant, ()))
+            add(sorted(candidates, key=lambda symbol: (abs(len(symbol) - len(term)), symbol)))
+
+        result = [self._entries[symbol] for symbol in ranked]
+        return {"count": len(result), "result": result}
+
+    def _read_snapshot(self) -> Optional[dict]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            logger.warning("Ignoring unreadable symbol snapshot %s: %s", self.path, e)
+            return None
+
+    def _write_snapshot(self, entries: list, fetched_at: float):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".tmp", "w") as f:
+            json.dump({"fetched_at": fetched_at, "symbols": entries}, f)
+        os.replace(self.path + ".tmp", self.path)
+
+    async def load_snapshot(self) -> bool:
+        snapshot = await asyncio.to_thread(self._read_snapshot)
+        if not snapshot:
+            return False
+        self.swap(await asyncio.to_thread(self.build, snapshot["symbols"]), snapshot.get("fetched_at"))
+        return True
+
+    async def refresh(self):
+        entries = await get_stock_symbols(self.exchange)
+        if not entries:
+            raise ValueError("Empty symbol list")
+        built = await asyncio.to_thread(self.build, entries)
+        self.swap(built)
+        await asyncio.to_thread(self._write_snapshot, list(built[0].values()), self.fetched_at)
+        logger.info("Symbol index refreshed: %d symbols", len(self))
+
+
+class SymbolIndexRefresher:
+    """Background task that refreshes the index whenever its snapshot is older than ``interval``."""
+
+    def __init__(self, index: SymbolIndex, interval: float, retry_delay: float = 300.0):
+        self.index = index
+        self.interval = interval
+        self.retry_delay = retry_delay
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        await self.index.load_snapshot()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            age = time.time() - self.index.fetched_at
+            if self.index.loaded and age < self.interval:
+                await asyncio.sleep(self.interval - age)
+                continue
+            try:
+                await self.index.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Symbol index refresh failed: %s", e)
+                await asyncio.sleep(self.retry_delay)
+
+
+symbol_index = SymbolIndex(settings.SYMBOL_INDEX_PATH, settings.SYMBOL_INDEX_EXCHANGE)
+symbol_index_refresher = SymbolIndexRefresher(symbol_index, settings.SYMBOL_INDEX_REFRESH_INTERVAL)
+
+# symbol -> bool; only used until the index has loaded
+symbol_cache = TTLCache(maxsize=settings.SYMBOL_CACHE_MAX_ENTRIES, ttl=settings.SYMBOL_CACHE_TTL)
+
+
+async def _quote_says_valid(symbol: str) -> bool:
+    quote = await get_stock_quote(symbol)
+    return bool(quote) and not quote.get('error')
+
+
+async def is_valid_symbol(symbol: str) -> bool:
+    # Answered from the local index without network I/O once it has loaded.
+    # Before that, upstream failures propagate and are not cached.
+    symbol = normalize_symbol(symbol)
+    if symbol_index.loaded:
+        return symbol in symbol_index
+    return await symbol_cache.get_or_load(symbol, lambda: _quote_says_valid(symbol))
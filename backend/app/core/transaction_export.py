@@ -0,0 +1,40 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Optional
+from sqlalchemy import Select
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.serialization import json_default
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def format_chunk(columns: list, rows, file_format: str) -> str:
+    if file_format == "ndjson":
+        return "".join(
+            json.dumps(dict(zip(columns, row)), default=json_default) + "\n" for row in rows
+        )
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerows(
+        [value.isoformat() if isinstance(value, datetime) else value for value in row] for row in rows
+    )
+    return buffer.getvalue()
+
+
+async def stream_rows(query: Select, file_format: str, chunk_size: Optional[int] = None) -> AsyncIterator[str]:
+    # Owns its session: the request's session is closed before the response body is sent
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    columns = [column.name for column in query.selected_columns]
+    if file_format == "csv":
+        yield format_chunk([], [columns], "csv")
+
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=chunk_size))
+        async for rows in result.partitions():
+            yield format_chunk(columns, rows, file_format)
@@ -0,0 +1,350 @@
+import codecs
+import csv
+import json
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.history import history_locks, invalidate_snapshots
+from app.core.positions import (
+    EPSILON,
+    InsufficientHoldings,
+    LotQueue,
+    apply_fill,
+    get_lot_method,
+    open_lot,
+    portfolio_locks
+)
+from app.core.symbols import is_valid_symbol
+from app.models.portfolio import LotDisposal, Stock, TaxLot, Transaction
+
+class RowError(ValueError):
+    pass
+
+
+def iter_text_lines(fileobj, chunk_size: int = 64 * 1024) -> Iterator[str]:
+    # Decode incrementally so only one chunk of the upload is in memory at a time
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        pending += decoder.decode(chunk)
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def iter_rows(fileobj, file_format: str) -> Iterator[tuple]:
+    # Yields (row_number, dict) or (row_number, RowError) for rows that cannot be parsed
+    lines = iter_text_lines(fileobj)
+    if file_format == "ndjson":
+        for row_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield row_number, RowError(f"Invalid JSON: {e}")
+                continue
+            if not isinstance(record, dict):
+                yield row_number, RowError("Expected a JSON object")
+                continue
+            yield row_number, record
+    else:
+        reader = csv.DictReader(lines)
+        for record in reader:
+            # Header is line 1, so data rows are numbered from 2 like a spreadsheet
+            yield reader.line_num, record
+
+
+def to_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    # Timestamps are stored as naive UTC (CURRENT_TIMESTAMP)
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def parse_row(record: dict, now: datetime) -> dict:
+    symbol = str(record.get("symbol") or "").strip().upper()
+    if not symbol:
+        raise RowError("Missing symbol")
+
+    try:
+        quantity = float(record.get("quantity"))
+        price = float(record.get("price"))
+    except (TypeError, ValueError):
+        raise RowError("quantity and price must be numbers")
+    if price < 0:
+        raise RowError("price must not be negative")
+
+    transaction_type = str(record.get("type") or "").strip().upper()
+    if not transaction_type:
+        transaction_type = "BUY" if quantity >= 0 else "SELL"
+    if transaction_type not in ("BUY", "SELL"):
+        raise RowError(f"Unknown type: {transaction_type}")
+    quantity = abs(quantity)
+    if quantity <= EPSILON:
+        raise RowError("quantity must be non-zero")
+
+    timestamp = record.get("timestamp")
+    if timestamp:
+        try:
+            timestamp = to_utc_naive(datetime.fromisoformat(str(timestamp).strip().replace("Z", "+00:00")))
+        except ValueError:
+            raise RowError(f"Invalid timestamp: {timestamp}")
+    else:
+        timestamp = now
+
+    return {
+        "symbol": symbol,
+        "quantity": quantity if transaction_type == "BUY" else -quantity,
+        "price": price,
+        "type": transaction_type,
+        "timestamp": timestamp,
+    }
+
+
+class ImportResult:
+    def __init__(self, max_errors: int):
+        self.max_errors = max_errors
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        # Per symbol, whether a position was held before the first batch touching it and
+        # after the last; only the net change matters to price-stream subscriptions
+        self.held_before = {}
+        self.held_after = {}
+
+    @property
+    def opened(self) -> set:
+        return {
+            symbol for symbol, before in self.held_before.items()
+            if not before and self.held_after.get(symbol, before)
+        }
+
+    @property
+    def closed(self) -> set:
+        return {
+            symbol for symbol, before in self.held_before.items()
+            if before and not self.held_after.get(symbol, before)
+        }
+
+    def fail(self, row_number: int, error: str):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row_number, "error": error})
+
+    def as_dict(self) -> dict:
+        return {
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors)
+        }
+
+
+async def _load_open_lots(db: AsyncSession, portfolio_id: int, symbol: str, needed: float, lot_method) -> list:
+    # Stored open lots in consumption order, read only until ``needed`` is covered. Kept as
+    # detached objects and written back with executemany statements per batch; the ORM
+    # unit of work would insert and update them one round trip at a time
+    lots = []
+    covered = 0.0
+    result = await db.stream(
+        select(
+            TaxLot.id, TaxLot.quantity, TaxLot.remaining, TaxLot.cost_per_share, TaxLot.opened_at
+        )
+        .filter(
+            TaxLot.portfolio_id == portfolio_id,
+            TaxLot.symbol == symbol,
+            TaxLot.remaining > 0
+        )
+        .order_by(*lot_method.order_by)
+        .execution_options(yield_per=100)
+    )
+    async for lot_id, quantity, remaining, cost_per_share, opened_at in result:
+        lots.append(TaxLot(
+            id=lot_id,
+            portfolio_id=portfolio_id,
+            symbol=symbol,
+            quantity=quantity,
+            remaining=remaining,
+            cost_per_share=cost_per_share,
+            opened_at=opened_at
+        ))
+        covered += remaining
+        if covered + EPSILON >= needed:
+            break
+    await result.close()
+    return lots
+
+
+async def _write_lots(db: AsyncSession, new_lots: list, disposals: list):
+    stored = {id(lot): lot for lot, _ in disposals if lot.id is not None}
+    if stored:
+        await db.execute(update(TaxLot), [{"id": lot.id, "remaining": lot.remaining} for lot in stored.values()])
+    if new_lots:
+        lot_ids = await db.scalars(
+            insert(TaxLot).returning(TaxLot.id, sort_by_parameter_order=True),
+            [
+                {
+                    "portfolio_id": lot.portfolio_id,
+                    "symbol": lot.symbol,
+                    "quantity": lot.quantity,
+                    "remaining": lot.remaining,
+                    "cost_per_share": lot.cost_per_share,
+                    "opened_at": lot.opened_at
+                }
+                for lot in new_lots
+            ]
+        )
+        for lot, lot_id in zip(new_lots, lot_ids):
+            lot.id = lot_id
+    if disposals:
+        await db.execute(insert(LotDisposal), [
+            {
+                "portfolio_id": disposal.portfolio_id,
+                "lot_id": lot.id,
+                "symbol": disposal.symbol,
+                "quantity": disposal.quantity,
+                "cost_basis": disposal.cost_basis,
+                "proceeds": disposal.proceeds,
+                "opened_at": disposal.opened_at,
+                "closed_at": disposal.closed_at
+            }
+            for lot, disposal in disposals
+        ])
+
+
+async def _apply_batch(db: AsyncSession, portfolio_id: int, batch: list, result: ImportResult):
+    symbols = {row["symbol"] for _, row in batch}
+    valid_symbols = set()
+    for symbol in symbols:
+        try:
+            if await is_valid_symbol(symbol):
+                valid_symbols.add(symbol)
+        except Exception:
+            pass
+
+    positions = {
+        stock.symbol: stock
+        for stock in await db.scalars(
+            select(Stock)
+            .filter(Stock.portfolio_id == portfolio_id, Stock.symbol.in_(valid_symbols))
+            .execution_options(populate_existing=True)
+        )
+    }
+    # Running (quantity, average cost) per symbol; written back once per symbol below
+    state = {
+        symbol: (stock.quantity, stock.average_cost or 0.0) for symbol, stock in positions.items()
+    }
+    for symbol in valid_symbols:
+        result.held_before.setdefault(symbol, symbol in positions)
+
+    # Stored lots are read per batch, in lot-method order and only as far as the batch's sells
+    # need, so memory is bounded by the batch size rather than by the portfolio's history
+    lot_method = get_lot_method()
+    sold = {}
+    for _, row in batch:
+        if row["quantity"] < 0 and row["symbol"] in valid_symbols:
+            sold[row["symbol"]] = sold.get(row["symbol"], 0.0) - row["quantity"]
+    lot_queues = {symbol: LotQueue(lot_method) for symbol in valid_symbols}
+    for symbol, needed in sold.items():
+        for lot in await _load_open_lots(db, portfolio_id, symbol, needed, lot_method):
+            lot_queues[symbol].push(lot)
+    new_lots, disposals = [], []
+
+    rows = []
+    for row_number, row in batch:
+        symbol = row["symbol"]
+        if symbol not in valid_symbols:
+            result.fail(row_number, f"Invalid stock symbol: {symbol}")
+            continue
+        held, average_cost = state.get(symbol, (0.0, 0.0))
+        try:
+            state[symbol] = apply_fill(symbol, held, average_cost, row["quantity"], row["price"])
+        except InsufficientHoldings as e:
+            result.fail(row_number, str(e))
+            continue
+        lots = lot_queues[symbol]
+        if row["quantity"] > 0:
+            lot = open_lot(portfolio_id, symbol, row["quantity"], row["price"], row["timestamp"])
+            lots.push(lot)
+            new_lots.append(lot)
+        else:
+            disposals.extend(lots.consume(-row["quantity"], row["price"], row["timestamp"]))
+        rows.append({"portfolio_id": portfolio_id, **row})
+
+    if rows:
+        await db.execute(insert(Transaction), rows)
+        earliest = min(row["timestamp"] for row in rows).date()
+        if earliest < datetime.now(timezone.utc).date():
+            await invalidate_snapshots(db, portfolio_id, earliest)
+
+    await _write_lots(db, new_lots, disposals)
+    del lot_queues, new_lots, disposals
+
+    now = datetime.now(timezone.utc)
+    for symbol, (quantity, average_cost) in state.items():
+        result.held_after[symbol] = quantity > EPSILON
+        stock = positions.get(symbol)
+        if stock is None:
+            if quantity > EPSILON:
+                db.add(Stock(
+                    portfolio_id=portfolio_id,
+                    symbol=symbol,
+                    quantity=quantity,
+                    average_cost=average_cost,
+                    updated_at=now
+                ))
+        elif quantity <= EPSILON:
+            await db.delete(stock)
+        elif (stock.quantity, stock.average_cost) != (quantity, average_cost):
+            stock.quantity = quantity
+            stock.average_cost = average_cost
+            stock.updated_at = now
+
+    await db.commit()
+    result.imported += len(rows)
+
+
+async def _apply_locked(db: AsyncSession, portfolio_id: int, batch: list, result: ImportResult):
+    # Each batch reads, checks and commits holdings like a single trade does; the history
+    # lock keeps a concurrent history extension from persisting days this batch invalidates
+    async with portfolio_locks(portfolio_id), history_locks(portfolio_id):
+        await _apply_batch(db, portfolio_id, batch, result)
+
+
+async def import_transactions(
+        db: AsyncSession,
+        portfolio_id: int,
+        fileobj,
+        file_format: str,
+        batch_size: Optional[int] = None
+) -> ImportResult:
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    result = ImportResult(max_errors=settings.IMPORT_MAX_ERRORS)
+    now = to_utc_naive(datetime.now(timezone.utc))
+
+    batch = []
+    for row_number, record in iter_rows(fileobj, file_format):
+        if isinstance(record, RowError):
+            result.fail(row_number, str(record))
+            continue
+        try:
+            batch.append((row_number, parse_row(record, now)))
+        except RowError as e:
+            result.fail(row_number, str(e))
+            continue
+        if len(batch) >= batch_size:
+            await _apply_locked(db, portfolio_id, batch, result)
+            batch = []
+    if batch:
+        await _apply_locked(db, portfolio_id, batch, result)
+    return result
@@ -0,0 +1,82 @@
+import asyncio
+from typing import Iterable, Optional
+from app.core.config import settings
+from app.core.finnhub_client import get_stock_quote
+from app.core.symbols import symbol_index
+
+
+async def fetch_quotes(symbols: Iterable[str], concurrency: Optional[int] = None):
+    # Dedupe, then fetch every symbol concurrently with at most `concurrency` in flight
+    unique_symbols = list(dict.fromkeys(symbols))
+    errors = {}
+    # Once the index has loaded, symbols it does not list are never sent upstream
+    if symbol_index.loaded:
+        for symbol in unique_symbols:
+            if symbol not in symbol_index:
+                errors[symbol] = "Unknown symbol"
+        unique_symbols = [symbol for symbol in unique_symbols if symbol not in errors]
+    semaphore = asyncio.Semaphore(concurrency or settings.QUOTE_FANOUT_CONCURRENCY)
+
+    async def fetch(symbol: str):
+        async with semaphore:
+            return await get_stock_quote(symbol)
+
+    results = await asyncio.gather(*(fetch(symbol) for symbol in unique_symbols), return_exceptions=True)
+
+    quotes = {}
+    for symbol, result in zip(unique_symbols, results):
+        if isinstance(result, Exception):
+            errors[symbol] = str(result) or type(result).__name__
+        elif not result or result.get('error'):
+            errors[symbol] = (result or {}).get('error') or "Quote unavailable"
+        elif not result.get('t') or not result.get('pc'):
+            # Finnhub answers unknown or unpriced symbols with an all-zero quote, not an error
+            errors[symbol] = "Quote unavailable"
+        else:
+            quotes[symbol] = result
+    return quotes, errors
+
+
+async def value_portfolios(portfolios):
+    quotes, errors = await fetch_quotes(
+        stock.symbol for portfolio in portfolios for stock in portfolio.stocks
+    )
+
+    total_value = 0
+    portfolio_values = []
+    for portfolio in portfolios:
+        portfolio_value = 0
+        stock_values = []
+        for stock in portfolio.stocks:
+            quote = quotes.get(stock.symbol)
+            if quote is None:
+                continue
+            current_price = quote['c']
+            value = current_price * stock.quantity
+            portfolio_value += value
+            stock_values.append({
+                "symbol": stock.symbol,
+                "quantity": stock.quantity,
+                "current_price": current_price,
+                "value": value,
+                "percentage": 0  # Filled in once the portfolio total is known
+            })
+
+        for stock_value in stock_values:
+            stock_value["percentage"] = (
+                (stock_value["value"] / portfolio_value) * 100 if portfolio_value > 0 else 0
+            )
+
+        total_value += portfolio_value
+        portfolio_values.append({
+            "id": portfolio.id,
+            "name": portfolio.name,
+            "value": portfolio_value,
+            "stocks": stock_values
+        })
+
+    return {
+        "total_value": total_value,
+        "portfolios": portfolio_values,
+        "errors": [{"symbol": symbol, "detail": detail} for symbol, detail in errors.items()]
+    }
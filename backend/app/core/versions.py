@@ -0,0 +1,75 @@
+from typing import Iterable, Optional
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.models.portfolio import Portfolio
+from app.models.user import User
+
+# Monotonic counters bumped inside the same transaction as every write, so a read can
+# answer a conditional GET from one indexed column instead of loading the resource.
+# Plain UPDATE statements: no ORM events fire (the principal cache stays warm) and
+# users.updated_at is left alone.
+
+
+async def bump_portfolio_version(db: AsyncSession, user_id: int, portfolio_id: Optional[int] = None):
+    # Any portfolio write also changes the user's portfolio list
+    if portfolio_id is not None:
+        await db.execute(
+            update(Portfolio)
+            .where(Portfolio.id == portfolio_id)
+            .values(version=Portfolio.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+    await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(portfolios_version=User.portfolios_version + 1, updated_at=User.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def bump_portfolio_versions(db: Session, portfolio_ids: Iterable[int]):
+    # Sync variant for maintenance scripts that rewrite many portfolios at once
+    portfolio_ids = list(portfolio_ids)
+    if not portfolio_ids:
+        return
+    db.execute(
+        update(Portfolio)
+        .where(Portfolio.id.in_(portfolio_ids))
+        .values(version=Portfolio.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(User)
+        .where(User.id.in_(select(Portfolio.user_id).where(Portfolio.id.in_(portfolio_ids))))
+        .values(portfolios_version=User.portfolios_version + 1, updated_at=User.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def bump_watchlist_version(db: AsyncSession, user_id: int):
+    await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(watchlist_version=User.watchlist_version + 1, updated_at=User.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def portfolio_version(db: AsyncSession, user_id: int, portfolio_id: int) -> Optional[int]:
+    # None when the portfolio does not exist or belongs to someone else
+    return await db.scalar(
+        select(Portfolio.version).filter(Portfolio.id == portfolio_id, Portfolio.user_id == user_id)
+    )
+
+
+async def user_versions(db: AsyncSession, user_id: int) -> tuple:
+    row = (await db.execute(
+        select(User.portfolios_version, User.watchlist_version).where(User.id == user_id)
+    )).one()
+    return row.portfolios_version or 0, row.watchlist_version or 0
+
+
+def version_etag(kind: str, owner_id: int, version: int, variant: str = "") -> str:
+    # Strong: the body is fully determined by (resource, version, representation variant)
+    return f'"{kind}-{owner_id}-{version}{variant}"'
@@ -1,16 +1,27 @@
+import sys
+from datetime import datetime, timezone
 from app.core.database import Base, engine, SessionLocal
+from app.core.migrations import migration_metadata, run_migrations
+from app.core.positions import open_lot
 from app.models import User, Portfolio, Stock, Transaction
 from app.core.security import get_password_hash
 
 
-def init_db():
-    # Drop all tables
-    Base.metadata.drop_all(bind=engine)
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
+def init_db(reset: bool = False):
+    if reset:
+        # Drop all tables, including the migration history
+        Base.metadata.drop_all(bind=engine)
+        migration_metadata.drop_all(bind=engine)
+    # Create or upgrade the schema without touching existing data
+    with engine.begin() as conn:
+        run_migrations(conn)
 
     db = SessionLocal()
     try:
+        if db.query(User).filter(User.username == "test").first():
+            print("Test data already exists")
+            return
+
         # Create test user
         test_user = User(
             email="test@example.com",
@@ -47,6 +58,7 @@ def init_db():
                 type="BUY"
             )
             db.add(transaction)
+            db.add(open_lot(portfolio.id, stock.symbol, stock.quantity, 0.0, datetime.now(timezone.utc)))
 
         db.commit()
         print("Test data created successfully!")
@@ -59,4 +71,4 @@ def init_db():
 
 
 if __name__ == "__main__":
-    init_db()
+    init_db(reset="--reset" in sys.argv)
@@ -0,0 +1,26 @@
+import sys
+from app.core.database import engine
+from app.core.migrations import MIGRATIONS, explain_hot_queries, run_migrations
+
+
+def migrate():
+    with engine.begin() as conn:
+        applied = run_migrations(conn)
+    for version, description in applied:
+        print(f"Applied migration {version}: {description}")
+    print(f"Schema is at version {MIGRATIONS[-1][0]}")
+
+
+def explain():
+    ok = True
+    with engine.connect() as conn:
+        for name, (uses_index, details) in explain_hot_queries(conn).items():
+            ok = ok and uses_index
+            print(f"[{'ok' if uses_index else 'NO INDEX'}] {name}: {'; '.join(details)}")
+    return ok
+
+
+if __name__ == "__main__":
+    migrate()
+    if "--explain" in sys.argv and not explain():
+        sys.exit(1)
@@ -1,6 +1,8 @@
 from app.core.database import Base
 from .user import User
-from .portfolio import Portfolio, Stock, Transaction
+from .portfolio import LotDisposal, Portfolio, PortfolioSnapshot, Stock, TaxLot, Transaction
 from .watchlist import Watchlist
 
-__all__ = ['Base', 'User', 'Portfolio', 'Stock', 'Transaction', 'Watchlist']
+__all__ = [
+    'Base', 'User', 'Portfolio', 'PortfolioSnapshot', 'Stock', 'Transaction', 'TaxLot', 'LotDisposal', 'Watchlist'
+]
@@ -1,39 +1,55 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Date, DateTime, Index, JSON, insert_sentinel
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 from sqlalchemy.sql import func
 
 
+# SQLite compares datetimes as text, so values bound from Python must use the same
+# whole-second format as CURRENT_TIMESTAMP for (timestamp, id) keyset comparisons to hold
+TIMESTAMP = DateTime(timezone=True).with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite"
+)
+
+
 class Portfolio(Base):
     __tablename__ = "portfolios"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    # Bumped by every write (app.core.versions); backs the ETag of portfolio reads
+    version = Column(Integer, nullable=False, default=0, server_default="0")
 
     user = relationship("User", back_populates="portfolios")
-    stocks = relationship("Stock", back_populates="portfolio", cascade="all, delete-orphan")
-    transactions = relationship("Transaction", back_populates="portfolio", cascade="all, delete-orphan")
+    # Collections must be loaded explicitly (see PORTFOLIO_LOAD_OPTIONS in routes/portfolio.py);
+    # an implicit lazy load per portfolio raises instead of silently issuing N+1 queries
+    stocks = relationship(
+        "Stock", back_populates="portfolio", cascade="all, delete-orphan", lazy="raise_on_sql"
+    )
+    transactions = relationship(
+        "Transaction", back_populates="portfolio", cascade="all, delete-orphan", lazy="raise_on_sql"
+    )
 
     @property
     def holdings(self):
-        # Group transactions by symbol and calculate net position
-        holdings = {}
-        for transaction in self.transactions:
-            if transaction.symbol not in holdings:
-                holdings[transaction.symbol] = 0
-            holdings[transaction.symbol] += transaction.quantity
-
-        # Filter out positions with zero quantity
-        return {k: v for k, v in holdings.items() if v > 0}
+        # Read from the positions ledger (stocks), which the transaction write path keeps current
+        return {stock.symbol: stock.quantity for stock in self.stocks if stock.quantity > 0}
 
 
 class Stock(Base):
+    # One row per open position, maintained by app.core.positions alongside each transaction
     __tablename__ = "stocks"
+    __table_args__ = (
+        Index("ux_stocks_portfolio_symbol", "portfolio_id", "symbol", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     symbol = Column(String, index=True)
     quantity = Column(Float)
+    average_cost = Column(Float, default=0.0)
+    updated_at = Column(TIMESTAMP, server_default=func.now())
     portfolio_id = Column(Integer, ForeignKey("portfolios.id"))
 
     portfolio = relationship("Portfolio", back_populates="stocks")
@@ -41,13 +57,87 @@ class Stock(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Keyset pagination of a portfolio's history, newest first
+        Index("ix_transactions_portfolio_timestamp_id", "portfolio_id", "timestamp", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     portfolio_id = Column(Integer, ForeignKey("portfolios.id"))
     symbol = Column(String, index=True)
     quantity = Column(Float)  # Positive for buys, negative for sells
     price = Column(Float)
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    timestamp = Column(TIMESTAMP, server_default=func.now())
     type = Column(String)  # "BUY" or "SELL"
 
     portfolio = relationship("Portfolio", back_populates="transactions")
+
+
+class PortfolioSnapshot(Base):
+    # End-of-day value per completed (UTC) day, extended forward by app.core.history
+    __tablename__ = "portfolio_snapshots"
+    __table_args__ = (
+        Index("ux_portfolio_snapshots_portfolio_date", "portfolio_id", "date", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    portfolio_id = Column(Integer, ForeignKey("portfolios.id"))
+    date = Column(Date)
+    value = Column(Float)
+    net_flow = Column(Float)  # Buys minus sells at trade price on that day
+    twr_index = Column(Float)  # Cumulative time-weighted return, 1.0 at the first snapshot
+    holdings = Column(JSON)  # Quantities at end of day, the starting point for extending forward
+
+
+class TaxLot(Base):
+    # One row per buy; remaining shrinks as sells are matched against it
+    # (app.core.positions.apply_lots, and per batch in app.core.transaction_import)
+    __tablename__ = "tax_lots"
+    __table_args__ = (
+        Index("ix_tax_lots_portfolio_symbol_opened", "portfolio_id", "symbol", "opened_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    portfolio_id = Column(Integer, ForeignKey("portfolios.id"))
+    symbol = Column(String)
+    quantity = Column(Float)
+    remaining = Column(Float)
+    cost_per_share = Column(Float)
+    opened_at = Column(TIMESTAMP, server_default=func.now())
+    # Lets a batched INSERT ... RETURNING hand back ids in parameter order on SQLite
+    _sentinel = insert_sentinel()
+
+
+# Open lots in matching order (app.core.positions.LOT_METHODS), so a sell reads them straight
+# off an index and stops once covered. Partial: fully consumed lots (remaining = 0) are not
+# in them, so old closed lots are never walked past. FIFO reads forwards, LIFO backwards.
+Index(
+    "ix_tax_lots_open_by_age",
+    TaxLot.portfolio_id, TaxLot.symbol, TaxLot.opened_at, TaxLot.id,
+    sqlite_where=TaxLot.remaining > 0,
+    postgresql_where=TaxLot.remaining > 0
+)
+Index(
+    "ix_tax_lots_open_by_cost",
+    TaxLot.portfolio_id, TaxLot.symbol, TaxLot.cost_per_share.desc(), TaxLot.opened_at, TaxLot.id,
+    sqlite_where=TaxLot.remaining > 0,
+    postgresql_where=TaxLot.remaining > 0
+)
+
+
+class LotDisposal(Base):
+    # The part of a lot closed by a sell, with its realized cost basis and proceeds
+    __tablename__ = "lot_disposals"
+    __table_args__ = (
+        Index("ix_lot_disposals_portfolio_symbol", "portfolio_id", "symbol"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    portfolio_id = Column(Integer, ForeignKey("portfolios.id"))
+    lot_id = Column(Integer, ForeignKey("tax_lots.id"))
+    symbol = Column(String)
+    quantity = Column(Float)
+    cost_basis = Column(Float)
+    proceeds = Column(Float)
+    opened_at = Column(TIMESTAMP)
+    closed_at = Column(TIMESTAMP, server_default=func.now())
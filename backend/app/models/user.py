@@ -12,6 +12,9 @@ class User(Base):
     hashed_password = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Conditional-GET versions of the user's portfolio list and watchlist (app.core.versions)
+    portfolios_version = Column(Integer, nullable=False, default=0, server_default="0")
+    watchlist_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     # Add these relationship definitions
     portfolios = relationship("Portfolio", back_populates="user", cascade="all, delete-orphan")
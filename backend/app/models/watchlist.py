@@ -1,10 +1,13 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
 
 class Watchlist(Base):
     __tablename__ = "watchlists"
+    __table_args__ = (
+        Index("ux_watchlists_user_symbol", "user_id", "symbol", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -0,0 +1,80 @@
+import sys
+from datetime import datetime, timezone
+from sqlalchemy import delete, insert, select
+from app.core.database import SessionLocal
+from app.core.positions import EPSILON, InsufficientHoldings, apply_fill
+from app.core.versions import bump_portfolio_versions
+from app.models import Stock, Transaction
+
+
+def rebuild_positions(db):
+    # One ordered pass over the transaction history; only running totals are kept in memory
+    positions = {}
+    anomalies = 0
+    rows = db.execute(
+        select(Transaction.portfolio_id, Transaction.symbol, Transaction.quantity, Transaction.price)
+        .order_by(Transaction.portfolio_id, Transaction.symbol, Transaction.timestamp, Transaction.id)
+        .execution_options(yield_per=5000)
+    )
+    for portfolio_id, symbol, quantity, price in rows:
+        key = (portfolio_id, symbol)
+        held, average_cost = positions.get(key, (0.0, 0.0))
+        try:
+            positions[key] = apply_fill(symbol, held, average_cost, quantity or 0.0, price or 0.0)
+        except InsufficientHoldings:
+            # Oversold history: clamp the position at zero rather than going short
+            anomalies += 1
+            positions[key] = (0.0, 0.0)
+    return {key: value for key, value in positions.items() if value[0] > EPSILON}, anomalies
+
+
+def reconcile_positions(dry_run: bool = False):
+    db = SessionLocal()
+    try:
+        rebuilt, anomalies = rebuild_positions(db)
+        current = {
+            (portfolio_id, symbol): quantity
+            for portfolio_id, symbol, quantity in db.execute(
+                select(Stock.portfolio_id, Stock.symbol, Stock.quantity)
+            )
+        }
+
+        drifted = sorted(
+            key for key in set(current) | set(rebuilt)
+            if abs(current.get(key, 0.0) - rebuilt.get(key, (0.0, 0.0))[0]) > EPSILON
+        )
+        for portfolio_id, symbol in drifted:
+            print(
+                f"portfolio {portfolio_id} {symbol}: "
+                f"{current.get((portfolio_id, symbol), 0.0)} -> {rebuilt.get((portfolio_id, symbol), (0.0,))[0]}"
+            )
+        print(f"{len(rebuilt)} positions, {len(drifted)} drifted, {anomalies} oversold transactions clamped")
+        if dry_run:
+            return
+
+        now = datetime.now(timezone.utc)
+        db.execute(delete(Stock))
+        if rebuilt:
+            db.execute(insert(Stock), [
+                {
+                    "portfolio_id": portfolio_id,
+                    "symbol": symbol,
+                    "quantity": quantity,
+                    "average_cost": average_cost,
+                    "updated_at": now
+                }
+                for (portfolio_id, symbol), (quantity, average_cost) in rebuilt.items()
+            ])
+        # Every stocks row was rewritten (new ids and updated_at), so cached ETags must not match
+        bump_portfolio_versions(db, {portfolio_id for portfolio_id, _ in set(current) | set(rebuilt)})
+        db.commit()
+        print("Positions rebuilt from transactions")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    reconcile_positions(dry_run="--dry-run" in sys.argv)
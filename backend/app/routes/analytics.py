@@ -1,11 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.core.deps import get_db, get_current_user
-from app.models.user import User
-from app.models.portfolio import Portfolio, Stock
-from app.core.finnhub_client import get_stock_quote
-from typing import List, Dict
 import asyncio
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.core.config import settings
+from app.core.deps import Principal, get_db, get_current_user, get_user_from_token
+from app.core.history import portfolio_history
+from app.core.price_stream import PriceListener, price_book
+from app.core.risk import InsufficientHistory, portfolio_risk
+from app.core.valuation import value_portfolios
+from app.models.portfolio import Portfolio, Stock
 
 router = APIRouter()
 
@@ -13,68 +19,229 @@ router = APIRouter()
 @router.get("/portfolio-summary/{portfolio_id}")
 async def get_portfolio_summary(
         portfolio_id: int,
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        current_user: Principal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
 ):
-    portfolio = db.query(Portfolio).filter(
-        Portfolio.id == portfolio_id,
-        Portfolio.user_id == current_user.id
-    ).first()
+    portfolio = await db.scalar(
+        select(Portfolio).options(selectinload(Portfolio.stocks)).filter(
+            Portfolio.id == portfolio_id,
+            Portfolio.user_id == current_user.id
+        )
+    )
 
     if not portfolio:
         raise HTTPException(status_code=404, detail="Portfolio not found")
 
-    # Get current prices for all stocks
-    total_value = 0
-    stock_values = []
-
-    for stock in portfolio.stocks:
-        quote = await get_stock_quote(stock.symbol)
-        current_price = quote['c']
-        value = current_price * stock.quantity
-        total_value += value
-        stock_values.append({
-            "symbol": stock.symbol,
-            "quantity": stock.quantity,
-            "current_price": current_price,
-            "value": value,
-            "percentage": 0  # Will be calculated after total is known
-        })
-
-    # Calculate percentages
-    for stock in stock_values:
-        stock["percentage"] = (stock["value"] / total_value) * 100 if total_value > 0 else 0
+    valuation = await value_portfolios([portfolio])
+    portfolio_value = valuation["portfolios"][0]
 
     return {
-        "total_value": total_value,
-        "stocks": stock_values
+        "total_value": portfolio_value["value"],
+        "stocks": portfolio_value["stocks"],
+        "errors": valuation["errors"]
     }
 
 
 @router.get("/portfolio-performance")
 async def get_portfolio_performance(
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        current_user: Principal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    result = await db.scalars(
+        select(Portfolio).options(selectinload(Portfolio.stocks)).filter(Portfolio.user_id == current_user.id)
+    )
+    portfolios = result.all()
+
+    # Symbols are deduped across all portfolios and fetched concurrently
+    valuation = await value_portfolios(portfolios)
+
+    return {
+        "total_value": valuation["total_value"],
+        "portfolios": [
+            {"name": portfolio_value["name"], "value": portfolio_value["value"]}
+            for portfolio_value in valuation["portfolios"]
+        ],
+        "errors": valuation["errors"]
+    }
+
+
+@router.get("/portfolio-risk/{portfolio_id}")
+async def get_portfolio_risk(
+        portfolio_id: int,
+        benchmark: str = settings.RISK_BENCHMARK_SYMBOL,
+        as_of: Optional[date] = None,
+        lookback_days: int = Query(365, ge=30, le=3650),
+        risk_free_rate: float = settings.RISK_FREE_RATE,
+        current_user: Principal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
 ):
-    portfolios = db.query(Portfolio).filter(Portfolio.user_id == current_user.id).all()
+    portfolio_exists = await db.scalar(
+        select(Portfolio.id).filter(
+            Portfolio.id == portfolio_id,
+            Portfolio.user_id == current_user.id
+        )
+    )
+    if portfolio_exists is None:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
 
-    total_value = 0
-    portfolio_values = []
+    rows = await db.execute(
+        select(Stock.symbol, Stock.quantity).filter(Stock.portfolio_id == portfolio_id)
+    )
+    holdings = {symbol: quantity for symbol, quantity in rows}
+    await db.close()
 
-    for portfolio in portfolios:
-        portfolio_value = 0
-        for stock in portfolio.stocks:
-            quote = await get_stock_quote(stock.symbol)
-            value = quote['c'] * stock.quantity
-            portfolio_value += value
+    try:
+        return await portfolio_risk(
+            portfolio_id,
+            holdings,
+            benchmark.upper(),
+            as_of or date.today(),
+            lookback_days,
+            risk_free_rate
+        )
+    except InsufficientHistory as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"Failed to load price history: {str(e)}"
+        )
 
-        total_value += portfolio_value
-        portfolio_values.append({
-            "name": portfolio.name,
-            "value": portfolio_value
-        })
+
+@router.get("/portfolio-history/{portfolio_id}")
+async def get_portfolio_history(
+        portfolio_id: int,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        current_user: Principal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    portfolio_exists = await db.scalar(
+        select(Portfolio.id).filter(
+            Portfolio.id == portfolio_id,
+            Portfolio.user_id == current_user.id
+        )
+    )
+    if portfolio_exists is None:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+
+    try:
+        series = await portfolio_history(db, portfolio_id, start, end)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"Failed to load price history: {str(e)}"
+        )
+    time_weighted_return = None
+    if len(series) > 1 and series[0]["twr_index"]:
+        time_weighted_return = series[-1]["twr_index"] / series[0]["twr_index"] - 1.0
 
     return {
-        "total_value": total_value,
-        "portfolios": portfolio_values
+        "portfolio_id": portfolio_id,
+        "time_weighted_return": time_weighted_return,
+        "series": series
     }
+
+
+async def _portfolio_snapshot(portfolio_id: int, user_id: int, db: AsyncSession):
+    portfolio = await db.scalar(
+        select(Portfolio)
+        .options(selectinload(Portfolio.stocks))
+        .filter(
+            Portfolio.id == portfolio_id,
+            Portfolio.user_id == user_id
+        )
+        .execution_options(populate_existing=True)
+    )
+    # Release the connection before waiting on quotes; the socket may stay open for hours
+    await db.close()
+    if portfolio is None:
+        return None
+    return await value_portfolios([portfolio])
+
+
+@router.websocket("/ws/portfolio/{portfolio_id}")
+async def stream_portfolio_value(
+        websocket: WebSocket,
+        portfolio_id: int,
+        token: str,
+        db: AsyncSession = Depends(get_db)
+):
+    # Browsers cannot set headers on a websocket, so the JWT comes in the query string
+    try:
+        current_user = await get_user_from_token(token, db)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Could not validate credentials")
+        return
+    user_id = current_user.id
+
+    valuation = await _portfolio_snapshot(portfolio_id, user_id, db)
+    if valuation is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Portfolio not found")
+        return
+
+    await websocket.accept()
+    listener = PriceListener()
+    quantities = {}
+    values = {}
+    receive_task = update_task = None
+    try:
+        while True:
+            # (Re)build positions from the snapshot; any client message requests a refresh
+            price_book.unlisten(quantities, listener)
+            stocks = valuation["portfolios"][0]["stocks"]
+            quantities = {stock["symbol"]: 0 for stock in stocks}
+            values = {stock["symbol"]: 0 for stock in stocks}
+            for stock in stocks:
+                quantities[stock["symbol"]] += stock["quantity"]
+                values[stock["symbol"]] += stock["value"]
+            total_value = sum(values.values())
+            price_book.listen(quantities, listener)
+            await websocket.send_json({
+                "type": "snapshot",
+                "total_value": total_value,
+                "stocks": stocks,
+                "errors": valuation["errors"]
+            })
+
+            receive_task = asyncio.create_task(websocket.receive_text())
+            while not receive_task.done():
+                update_task = asyncio.create_task(listener.wait())
+                await asyncio.wait({receive_task, update_task}, return_when=asyncio.FIRST_COMPLETED)
+                if not update_task.done():
+                    update_task.cancel()
+                    break
+
+                # Only the symbols that moved are recomputed
+                changes = []
+                for symbol, (price, timestamp) in update_task.result().items():
+                    if symbol not in quantities:
+                        continue
+                    value = quantities[symbol] * price
+                    total_value += value - values[symbol]
+                    values[symbol] = value
+                    changes.append({
+                        "symbol": symbol,
+                        "current_price": price,
+                        "value": value,
+                        "timestamp": timestamp
+                    })
+                if changes:
+                    await websocket.send_json({
+                        "type": "update",
+                        "total_value": total_value,
+                        "changes": changes
+                    })
+
+            receive_task.result()
+            valuation = await _portfolio_snapshot(portfolio_id, user_id, db)
+            if valuation is None:
+                await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Portfolio not found")
+                return
+    except WebSocketDisconnect:
+        pass
+    finally:
+        price_book.unlisten(quantities, listener)
+        for task in (receive_task, update_task):
+            if task is not None and not task.done():
+                task.cancel()
@@ -0,0 +1,59 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core.deps import principal_cache
+from app.core.finnhub_client import quote_cache
+from app.core.fundamentals import fundamentals_cache
+from app.core.metrics import CounterFamily, GaugeFamily, registry
+from app.core.news import news_feed
+from app.core.price_stream import price_book
+from app.core.risk import risk_cache
+from app.core.security import password_hash_pool
+from app.core.symbols import symbol_cache, symbol_index
+
+router = APIRouter()
+
+CACHES = {
+    "quote": quote_cache,
+    "principal": principal_cache,
+    "symbol": symbol_cache,
+    "risk": risk_cache,
+    "fundamentals": fundamentals_cache,
+}
+# Cumulative counters in the caches' stats(); everything else there is a point-in-time value
+CACHE_EVENTS = ("hits", "misses", "coalesced", "evictions", "stale_hits", "disk_hits", "refresh_failures")
+
+
+def _component_metrics() -> list:
+    cache_size = GaugeFamily("cache_entries", "Entries held by each in-process cache.", ("cache",))
+    cache_hit_ratio = GaugeFamily("cache_hit_ratio", "Hits over lookups since start.", ("cache",))
+    cache_events = CounterFamily("cache_events_total", "Cache lookups by outcome.", ("cache", "event"))
+    for name, cache in CACHES.items():
+        stats = cache.stats()
+        cache_size.set(name, value=stats["size"])
+        cache_hit_ratio.set(name, value=stats["hit_rate"])
+        for event in CACHE_EVENTS:
+            if event in stats:
+                cache_events.inc(name, event, amount=stats[event])
+
+    pool = password_hash_pool.stats()
+    hash_pool = GaugeFamily("password_hash_pool", "bcrypt pool occupancy.", ("state",))
+    for state in ("queued", "in_flight", "max_workers", "max_queue_depth"):
+        hash_pool.set(state, value=pool[state])
+    hash_pool_calls = CounterFamily("password_hash_pool_calls_total", "bcrypt calls by outcome.", ("outcome",))
+    hash_pool_calls.set("completed", value=pool["completed"])
+    hash_pool_calls.set("rejected", value=pool["rejected"])
+
+    sizes = GaugeFamily("in_memory_items", "Items held by in-memory indexes and feeds.", ("store",))
+    sizes.set("price_book", value=len(price_book))
+    sizes.set("symbol_index", value=len(symbol_index))
+    sizes.set("news_feed", value=len(news_feed))
+    return [cache_size, cache_hit_ratio, cache_events, hash_pool, hash_pool_calls, sizes]
+
+
+registry.register_collector(_component_metrics)
+
+
+@router.get("", response_class=PlainTextResponse)
+async def get_metrics():
+    # Prometheus text exposition format 0.0.4
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
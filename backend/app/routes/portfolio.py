@@ -1,27 +1,147 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from app.core.deps import get_db, get_current_user
-from app.models.user import User
-from app.models.portfolio import Portfolio, Stock, Transaction
+import base64
+import json
+from datetime import datetime
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import noload, selectinload
+from typing import List, Optional
+from app.core.config import settings
+from app.core.deps import Principal, get_db, get_current_user
+from app.models.portfolio import LotDisposal, Portfolio, PortfolioSnapshot, Stock, TaxLot, Transaction
 from app.schemas.portfolio import (
     PortfolioCreate,
     Portfolio as PortfolioSchema,
     StockCreate,
     Stock as StockSchema,
-    TransactionCreate
+    TaxLot as TaxLotSchema,
+    TransactionCreate,
+    TransactionPage
 )
 from app.core.finnhub_client import get_stock_quote
+from app.core.http_cache import etag_matches, not_modified
+from app.core.history import history_locks
+from app.core.positions import (
+    CLOSED,
+    EPSILON,
+    OPENED,
+    InsufficientHoldings,
+    get_lot_method,
+    portfolio_locks,
+    record_trade
+)
+from app.core.price_stream import price_stream
+from app.core.serialization import FastJSONResponse, portfolio_payloads
+from app.core.symbols import is_valid_symbol, normalize_symbol
+from app.core.transaction_export import MEDIA_TYPES, stream_rows
+from app.core.transaction_import import import_transactions, to_utc_naive
+from app.core.valuation import fetch_quotes
+from app.core.versions import bump_portfolio_version, portfolio_version, user_versions, version_etag
 
 router = APIRouter()
 
+# One SELECT per collection regardless of how many portfolios are returned.
+# selectin rather than joined: joining both collections would multiply stocks x transactions rows.
+PORTFOLIO_LOAD_OPTIONS = (selectinload(Portfolio.stocks), selectinload(Portfolio.transactions))
+# For reads that leave transactions to the paginated /{portfolio_id}/transactions endpoint
+PORTFOLIO_LOAD_OPTIONS_NO_TRANSACTIONS = (selectinload(Portfolio.stocks), noload(Portfolio.transactions))
+
+INCLUDE_TRANSACTIONS = Query(
+    True,
+    description="Set to false to return an empty transactions list; "
+                "page through /portfolios/{portfolio_id}/transactions instead"
+)
+
+
+def _load_options(include_transactions: bool):
+    return PORTFOLIO_LOAD_OPTIONS if include_transactions else PORTFOLIO_LOAD_OPTIONS_NO_TRANSACTIONS
+
+
+def _encode_cursor(transaction: Transaction) -> str:
+    raw = json.dumps([transaction.timestamp.isoformat(), transaction.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    try:
+        timestamp, transaction_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return to_utc_naive(datetime.fromisoformat(timestamp)), int(transaction_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+async def _ensure_portfolio(db: AsyncSession, portfolio_id: int, user_id: int):
+    portfolio_exists = await db.scalar(
+        select(Portfolio.id).filter(
+            Portfolio.id == portfolio_id,
+            Portfolio.user_id == user_id
+        )
+    )
+    if portfolio_exists is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Portfolio not found"
+        )
+
+
+def _conditional(response: Response, if_none_match: Optional[str], etag: str) -> Optional[Response]:
+    # Per-user data: browsers may keep it but must revalidate every time
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, cache_control="private, no-cache")
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return None
+
+
+def _variant(include_transactions: bool) -> str:
+    return "" if include_transactions else "-nt"
+
+
+def _fast_response(request: Request, response: Response, content) -> FastJSONResponse:
+    # Returning a Response skips response_model; carry over the headers set on ``response``
+    return FastJSONResponse(
+        content,
+        headers=dict(response.headers),
+        accept_encoding=request.headers.get("accept-encoding", "")
+    )
+
+
+def _export_response(query, file_format: str, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        stream_rows(query, file_format),
+        media_type=MEDIA_TYPES[file_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{file_format}"'}
+    )
+
 
 @router.get("/me", response_model=PortfolioSchema)
 async def get_user_portfolio(
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        request: Request,
+        response: Response,
+        include_transactions: bool = INCLUDE_TRANSACTIONS,
+        if_none_match: Optional[str] = Header(None),
+        current_user: Principal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
 ):
-    portfolio = db.query(Portfolio).filter(Portfolio.user_id == current_user.id).first()
+    portfolios_version, _ = await user_versions(db, current_user.id)
+    etag = version_etag("me", current_user.id, portfolios_version, _variant(include_transactions))
+    not_modified_response = _conditional(response, if_none_match, etag)
+    if not_modified_response is not None:
+        return not_modified_response
+
+    if settings.FAST_SERIALIZATION:
+        payloads = await portfolio_payloads(db, current_user.id, include_transactions=include_transactions, limit=1)
+        if not payloads:
+            raise HTTPException(status_code=404, detail="Portfolio not found")
+        return _fast_response(request, response, payloads[0])
+
+    portfolio = await db.scalar(
+        select(Portfolio)
+        .options(*_load_options(include_transactions))
+        .filter(Portfolio.user_id == current_user.id)
+        .limit(1)
+    )
     if not portfolio:
         raise HTTPException(status_code=404, detail="Portfolio not found")
     return portfolio
@@ -30,57 +150,121 @@ async def get_user_portfolio(
 @router.post("/", response_model=PortfolioSchema)
 async def create_portfolio(
         portfolio: PortfolioCreate,
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        current_user: Principal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
 ):
-    db_portfolio = Portfolio(
-        name=portfolio.name,
-        user_id=current_user.id
-    )
-    db.add(db_portfolio)
-    db.commit()
-    db.refresh(db_portfolio)
-
-    # Add stocks to portfolio
+    # Validated (quantities, then the local symbol index) before anything is written;
+    # symbols are stored in canonical form so "aapl" and "AAPL" are one position
     for stock_data in portfolio.stocks:
-        # Verify stock exists by fetching quote
-        quote = await get_stock_quote(stock_data.symbol)
-        if not quote or quote.get('error'):
+        stock_data.symbol = normalize_symbol(stock_data.symbol)
+        if stock_data.quantity <= 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Quantity must be positive: {stock_data.symbol}"
+            )
+        if not await is_valid_symbol(stock_data.symbol):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Invalid stock symbol: {stock_data.symbol}"
             )
 
-        db_stock = Stock(
-            symbol=stock_data.symbol,
-            quantity=stock_data.quantity,
-            portfolio_id=db_portfolio.id
-        )
-        db.add(db_stock)
+    db_portfolio = Portfolio(
+        name=portfolio.name,
+        user_id=current_user.id
+    )
+    db.add(db_portfolio)
+    await bump_portfolio_version(db, current_user.id)
+    await db.commit()
+    await db.refresh(db_portfolio)
 
-    db.commit()
-    db.refresh(db_portfolio)
+    # Add stocks to portfolio
+    async with portfolio_locks(db_portfolio.id):
+        for stock_data in portfolio.stocks:
+            # The quote supplies the opening price
+            quote = await get_stock_quote(stock_data.symbol)
+            if not quote or quote.get('error'):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Invalid stock symbol: {stock_data.symbol}"
+                )
+
+            # Opening holdings are recorded as buys so the positions ledger matches the history
+            await record_trade(db, db_portfolio.id, stock_data.symbol, stock_data.quantity, quote['c'])
+
+        await bump_portfolio_version(db, current_user.id, db_portfolio.id)
+        await db.commit()
+    db_portfolio = await db.scalar(
+        select(Portfolio)
+        .options(*PORTFOLIO_LOAD_OPTIONS)
+        .filter(Portfolio.id == db_portfolio.id)
+        .execution_options(populate_existing=True)
+    )
+    await price_stream.track(stock.symbol for stock in db_portfolio.stocks)
     return db_portfolio
 
 
 @router.get("/", response_model=List[PortfolioSchema])
 async def read_portfolios(
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        request: Request,
+        response: Response,
+        include_transactions: bool = INCLUDE_TRANSACTIONS,
+        if_none_match: Optional[str] = Header(None),
+        current_user: Principal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
 ):
-    return db.query(Portfolio).filter(Portfolio.user_id == current_user.id).all()
+    portfolios_version, _ = await user_versions(db, current_user.id)
+    etag = version_etag("portfolios", current_user.id, portfolios_version, _variant(include_transactions))
+    not_modified_response = _conditional(response, if_none_match, etag)
+    if not_modified_response is not None:
+        return not_modified_response
+
+    if settings.FAST_SERIALIZATION:
+        payloads = await portfolio_payloads(db, current_user.id, include_transactions=include_transactions)
+        return _fast_response(request, response, payloads)
+
+    result = await db.scalars(
+        select(Portfolio)
+        .options(*_load_options(include_transactions))
+        .filter(Portfolio.user_id == current_user.id)
+    )
+    return result.all()
 
 
 @router.get("/{portfolio_id}", response_model=PortfolioSchema)
 async def read_portfolio(
         portfolio_id: int,
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        request: Request,
+        response: Response,
+        include_transactions: bool = INCLUDE_TRANSACTIONS,
+        if_none_match: Optional[str] = Header(None),
+        current_user: Principal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
 ):
-    portfolio = db.query(Portfolio).filter(
-        Portfolio.id == portfolio_id,
-        Portfolio.user_id == current_user.id
-    ).first()
+    # Ownership and version in one indexed lookup; no ORM objects unless the body is needed
+    version = await portfolio_version(db, current_user.id, portfolio_id)
+    if version is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Portfolio not found"
+        )
+    etag = version_etag("portfolio", portfolio_id, version, _variant(include_transactions))
+    not_modified_response = _conditional(response, if_none_match, etag)
+    if not_modified_response is not None:
+        return not_modified_response
+
+    if settings.FAST_SERIALIZATION:
+        payloads = await portfolio_payloads(db, current_user.id, portfolio_id, include_transactions)
+        if payloads:
+            return _fast_response(request, response, payloads[0])
+
+    portfolio = await db.scalar(
+        select(Portfolio)
+        .options(*_load_options(include_transactions))
+        .filter(
+            Portfolio.id == portfolio_id,
+            Portfolio.user_id == current_user.id
+        )
+    )
 
     if portfolio is None:
         raise HTTPException(
@@ -90,25 +274,192 @@ async def read_portfolio(
     return portfolio
 
 
-@router.delete("/{portfolio_id}")
-async def delete_portfolio(
+@router.get("/{portfolio_id}/transactions", response_model=TransactionPage)
+async def list_transactions(
         portfolio_id: int,
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        cursor: Optional[str] = None,
+        limit: int = Query(50, ge=1, le=500),
+        symbol: Optional[str] = None,
+        transaction_type: Optional[str] = Query(None, alias="type", pattern="^(BUY|SELL)$"),
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        current_user: Principal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
 ):
-    portfolio = db.query(Portfolio).filter(
-        Portfolio.id == portfolio_id,
-        Portfolio.user_id == current_user.id
-    ).first()
+    await _ensure_portfolio(db, portfolio_id, current_user.id)
+
+    # Newest first, keyset-paginated on (timestamp, id) so deep pages seek instead of scanning
+    query = select(Transaction).filter(Transaction.portfolio_id == portfolio_id)
+    if cursor:
+        query = query.filter(tuple_(Transaction.timestamp, Transaction.id) < _decode_cursor(cursor))
+    if symbol:
+        query = query.filter(Transaction.symbol == normalize_symbol(symbol))
+    if transaction_type:
+        query = query.filter(Transaction.type == transaction_type)
+    if start:
+        query = query.filter(Transaction.timestamp >= to_utc_naive(start))
+    if end:
+        query = query.filter(Transaction.timestamp < to_utc_naive(end))
+
+    result = await db.scalars(
+        query.order_by(Transaction.timestamp.desc(), Transaction.id.desc()).limit(limit + 1)
+    )
+    transactions = result.all()
 
-    if portfolio is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Portfolio not found"
+    next_cursor = None
+    if len(transactions) > limit:
+        transactions = transactions[:limit]
+        next_cursor = _encode_cursor(transactions[-1])
+    return {"items": transactions, "next_cursor": next_cursor}
+
+
+@router.get("/{portfolio_id}/transactions/export")
+async def export_transactions(
+        portfolio_id: int,
+        file_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+        symbol: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        current_user: Principal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    await _ensure_portfolio(db, portfolio_id, current_user.id)
+
+    # Plain column rows in (timestamp, id) order, read through a server-side cursor
+    query = select(
+        Transaction.id,
+        Transaction.timestamp,
+        Transaction.symbol,
+        Transaction.type,
+        Transaction.quantity,
+        Transaction.price
+    ).filter(Transaction.portfolio_id == portfolio_id)
+    if symbol:
+        query = query.filter(Transaction.symbol == normalize_symbol(symbol))
+    if start:
+        query = query.filter(Transaction.timestamp >= to_utc_naive(start))
+    if end:
+        query = query.filter(Transaction.timestamp < to_utc_naive(end))
+    query = query.order_by(Transaction.timestamp, Transaction.id)
+
+    return _export_response(query, file_format, f"portfolio-{portfolio_id}-transactions")
+
+
+@router.get("/{portfolio_id}/holdings/export")
+async def export_holdings(
+        portfolio_id: int,
+        file_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+        current_user: Principal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    await _ensure_portfolio(db, portfolio_id, current_user.id)
+
+    query = select(
+        Stock.symbol,
+        Stock.quantity,
+        Stock.average_cost,
+        Stock.updated_at
+    ).filter(Stock.portfolio_id == portfolio_id).order_by(Stock.symbol)
+
+    return _export_response(query, file_format, f"portfolio-{portfolio_id}-holdings")
+
+
+@router.get("/{portfolio_id}/lots", response_model=List[TaxLotSchema])
+async def list_tax_lots(
+        portfolio_id: int,
+        symbol: Optional[str] = None,
+        include_closed: bool = False,
+        current_user: Principal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    await _ensure_portfolio(db, portfolio_id, current_user.id)
+
+    query = select(TaxLot).filter(TaxLot.portfolio_id == portfolio_id)
+    if symbol:
+        query = query.filter(TaxLot.symbol == normalize_symbol(symbol))
+    if not include_closed:
+        query = query.filter(TaxLot.remaining > EPSILON)
+    result = await db.scalars(query.order_by(TaxLot.symbol, TaxLot.opened_at, TaxLot.id))
+    return result.all()
+
+
+@router.get("/{portfolio_id}/pnl")
+async def get_portfolio_pnl(
+        portfolio_id: int,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        current_user: Principal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    await _ensure_portfolio(db, portfolio_id, current_user.id)
+
+    # Aggregated in SQL from the lot ledger; no transaction history is replayed
+    open_rows = await db.execute(
+        select(
+            TaxLot.symbol,
+            func.sum(TaxLot.remaining),
+            func.sum(TaxLot.remaining * TaxLot.cost_per_share)
         )
+        .filter(TaxLot.portfolio_id == portfolio_id, TaxLot.remaining > EPSILON)
+        .group_by(TaxLot.symbol)
+    )
+    open_lots = {symbol: (quantity, cost_basis) for symbol, quantity, cost_basis in open_rows}
+
+    realized_query = select(
+        LotDisposal.symbol,
+        func.sum(LotDisposal.proceeds - LotDisposal.cost_basis)
+    ).filter(LotDisposal.portfolio_id == portfolio_id)
+    if start:
+        realized_query = realized_query.filter(LotDisposal.closed_at >= to_utc_naive(start))
+    if end:
+        realized_query = realized_query.filter(LotDisposal.closed_at < to_utc_naive(end))
+    realized = dict((await db.execute(realized_query.group_by(LotDisposal.symbol))).all())
+    await db.close()
+
+    quotes, errors = await fetch_quotes(list(open_lots))
+
+    symbols = []
+    for symbol in sorted(set(open_lots) | set(realized)):
+        quantity, cost_basis = open_lots.get(symbol, (0.0, 0.0))
+        market_value = unrealized = None
+        if symbol in quotes:
+            market_value = quantity * quotes[symbol]['c']
+            unrealized = market_value - cost_basis
+        symbols.append({
+            "symbol": symbol,
+            "quantity": quantity,
+            "cost_basis": cost_basis,
+            "market_value": market_value,
+            "unrealized_pnl": unrealized,
+            "realized_pnl": realized.get(symbol, 0.0)
+        })
+
+    return {
+        "realized_pnl": sum(item["realized_pnl"] for item in symbols),
+        "unrealized_pnl": sum(item["unrealized_pnl"] or 0.0 for item in symbols),
+        "symbols": symbols,
+        "errors": [{"symbol": symbol, "detail": detail} for symbol, detail in errors.items()]
+    }
 
-    db.delete(portfolio)
-    db.commit()
+
+@router.delete("/{portfolio_id}")
+async def delete_portfolio(
+        portfolio_id: int,
+        current_user: Principal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    await _ensure_portfolio(db, portfolio_id, current_user.id)
+
+    # Locked like any other holdings or snapshot write, so nothing is re-added after the delete
+    async with portfolio_locks(portfolio_id), history_locks(portfolio_id):
+        symbols = list(await db.scalars(select(Stock.symbol).filter(Stock.portfolio_id == portfolio_id)))
+        # Bulk deletes, children first; nothing is loaded into the session just to be removed
+        for model in (PortfolioSnapshot, LotDisposal, TaxLot, Transaction, Stock):
+            await db.execute(delete(model).where(model.portfolio_id == portfolio_id))
+        await db.execute(delete(Portfolio).where(Portfolio.id == portfolio_id))
+        await bump_portfolio_version(db, current_user.id)
+        await db.commit()
+    await price_stream.untrack(symbols)
     return {"message": "Portfolio deleted"}
 
 
@@ -116,43 +467,38 @@ async def delete_portfolio(
 async def add_stock_to_portfolio(
         portfolio_id: int,
         stock: StockCreate,
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        current_user: Principal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
 ):
-    portfolio = db.query(Portfolio).filter(
-        Portfolio.id == portfolio_id,
-        Portfolio.user_id == current_user.id
-    ).first()
+    portfolio = await db.scalar(
+        select(Portfolio).filter(
+            Portfolio.id == portfolio_id,
+            Portfolio.user_id == current_user.id
+        )
+    )
 
     if not portfolio:
         raise HTTPException(status_code=404, detail="Portfolio not found")
 
-    # Verify stock exists by fetching quote
+    if stock.quantity <= 0:
+        raise HTTPException(status_code=400, detail="Quantity must be positive")
+
+    stock.symbol = normalize_symbol(stock.symbol)
+    if not await is_valid_symbol(stock.symbol):
+        raise HTTPException(status_code=400, detail="Invalid stock symbol")
+
     quote = await get_stock_quote(stock.symbol)
     if quote.get('error'):
         raise HTTPException(status_code=400, detail="Invalid stock symbol")
 
-    # Check if stock already exists in portfolio
-    existing_stock = db.query(Stock).filter(
-        Stock.portfolio_id == portfolio_id,
-        Stock.symbol == stock.symbol
-    ).first()
-
-    if existing_stock:
-        # Update existing stock quantity
-        existing_stock.quantity += stock.quantity
-        db_stock = existing_stock
-    else:
-        # Create new stock entry
-        db_stock = Stock(
-            symbol=stock.symbol,
-            quantity=stock.quantity,
-            portfolio_id=portfolio_id
-        )
-        db.add(db_stock)
-
-    db.commit()
-    db.refresh(db_stock)
+    # Adding shares is recorded as a buy at the current price
+    async with portfolio_locks(portfolio_id):
+        _, db_stock, change = await record_trade(db, portfolio_id, stock.symbol, stock.quantity, quote['c'])
+        await bump_portfolio_version(db, current_user.id, portfolio_id)
+        await db.commit()
+    await db.refresh(db_stock)
+    if change == OPENED:
+        await price_stream.track([db_stock.symbol])
     return db_stock
 
 
@@ -160,29 +506,50 @@ async def add_stock_to_portfolio(
 async def remove_stock_from_portfolio(
         portfolio_id: int,
         stock_id: int,
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        current_user: Principal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
 ):
     # First verify the portfolio belongs to the user
-    portfolio = db.query(Portfolio).filter(
-        Portfolio.id == portfolio_id,
-        Portfolio.user_id == current_user.id
-    ).first()
+    portfolio = await db.scalar(
+        select(Portfolio).filter(
+            Portfolio.id == portfolio_id,
+            Portfolio.user_id == current_user.id
+        )
+    )
 
     if not portfolio:
         raise HTTPException(status_code=404, detail="Portfolio not found")
 
     # Then find and delete the stock
-    stock = db.query(Stock).filter(
-        Stock.id == stock_id,
-        Stock.portfolio_id == portfolio_id
-    ).first()
+    stock = await db.scalar(
+        select(Stock).filter(
+            Stock.id == stock_id,
+            Stock.portfolio_id == portfolio_id
+        )
+    )
 
     if not stock:
         raise HTTPException(status_code=404, detail="Stock not found")
 
-    db.delete(stock)
-    db.commit()
+    # Removing a holding sells it all, at the current price if one is available
+    try:
+        quote = await get_stock_quote(stock.symbol)
+    except Exception:
+        quote = None
+    async with portfolio_locks(portfolio_id):
+        # Re-read under the lock: a concurrent trade may have changed or closed the position
+        stock = await db.scalar(
+            select(Stock)
+            .filter(Stock.id == stock_id, Stock.portfolio_id == portfolio_id)
+            .execution_options(populate_existing=True)
+        )
+        if not stock:
+            raise HTTPException(status_code=404, detail="Stock not found")
+        price = quote['c'] if quote and not quote.get('error') else stock.average_cost or 0.0
+        await record_trade(db, portfolio_id, stock.symbol, -stock.quantity, price)
+        await bump_portfolio_version(db, current_user.id, portfolio_id)
+        await db.commit()
+    await price_stream.untrack([stock.symbol])
 
     return {"message": "Stock removed from portfolio"}
 
@@ -191,67 +558,89 @@ async def remove_stock_from_portfolio(
 async def add_transaction(
         portfolio_id: int,
         transaction: TransactionCreate,
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        current_user: Principal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
 ):
-    portfolio = db.query(Portfolio).filter(
-        Portfolio.id == portfolio_id,
-        Portfolio.user_id == current_user.id
-    ).first()
+    portfolio = await db.scalar(
+        select(Portfolio).filter(
+            Portfolio.id == portfolio_id,
+            Portfolio.user_id == current_user.id
+        )
+    )
 
     if not portfolio:
         raise HTTPException(status_code=404, detail="Portfolio not found")
 
-    # Verify stock exists
+    # Same rules as an imported row: BUY or SELL, and the type alone decides the direction
+    transaction_type = transaction.type.strip().upper()
+    if transaction_type not in ("BUY", "SELL"):
+        raise HTTPException(status_code=400, detail=f"Unknown type: {transaction.type}")
+    if transaction.quantity <= 0:
+        raise HTTPException(status_code=400, detail="Quantity must be positive")
+
+    transaction.symbol = normalize_symbol(transaction.symbol)
+    if not await is_valid_symbol(transaction.symbol):
+        raise HTTPException(status_code=400, detail="Invalid stock symbol")
+
     quote = await get_stock_quote(transaction.symbol)
     if quote.get('error'):
         raise HTTPException(status_code=400, detail="Invalid stock symbol")
 
-    # Get existing stock record if it exists
-    existing_stock = db.query(Stock).filter(
-        Stock.portfolio_id == portfolio_id,
-        Stock.symbol == transaction.symbol
-    ).first()
+    try:
+        get_lot_method(transaction.lot_method)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    if transaction.type == "SELL":
-        current_holdings = existing_stock.quantity if existing_stock else 0
-        if current_holdings < transaction.quantity:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Insufficient holdings. Current: {current_holdings}, Requested: {transaction.quantity}"
+    quantity = -transaction.quantity if transaction_type == "SELL" else transaction.quantity
+    async with portfolio_locks(portfolio_id):
+        try:
+            db_transaction, _, change = await record_trade(
+                db, portfolio_id, transaction.symbol, quantity, quote['c'], transaction_type, transaction.lot_method
             )
+        except InsufficientHoldings as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        await bump_portfolio_version(db, current_user.id, portfolio_id)
+        await db.commit()
+    await db.refresh(db_transaction)
+    if change == OPENED:
+        await price_stream.track([transaction.symbol])
+    elif change == CLOSED:
+        await price_stream.untrack([transaction.symbol])
+    return db_transaction
 
-        # Update or remove stock
-        if existing_stock:
-            new_quantity = existing_stock.quantity - transaction.quantity
-            if new_quantity <= 0:
-                db.delete(existing_stock)
-            else:
-                existing_stock.quantity = new_quantity
-
-        # Create sell transaction with negative quantity
-        transaction.quantity = -transaction.quantity
-    else:  # BUY
-        if existing_stock:
-            existing_stock.quantity += transaction.quantity
-        else:
-            new_stock = Stock(
-                portfolio_id=portfolio_id,
-                symbol=transaction.symbol,
-                quantity=transaction.quantity
-            )
-            db.add(new_stock)
-
-    # Record the transaction
-    db_transaction = Transaction(
-        portfolio_id=portfolio_id,
-        symbol=transaction.symbol,
-        quantity=transaction.quantity,
-        price=quote['c'],
-        type=transaction.type
+
+@router.post("/{portfolio_id}/transactions/import")
+async def import_portfolio_transactions(
+        portfolio_id: int,
+        file: UploadFile = File(...),
+        file_format: Optional[str] = Query(None, alias="format", pattern="^(csv|ndjson)$"),
+        current_user: Principal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db)
+):
+    portfolio = await db.scalar(
+        select(Portfolio.id).filter(
+            Portfolio.id == portfolio_id,
+            Portfolio.user_id == current_user.id
+        )
     )
 
-    db.add(db_transaction)
-    db.commit()
-    db.refresh(db_transaction)
-    return db_transaction
+    if not portfolio:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+
+    if file_format is None:
+        filename = (file.filename or "").lower()
+        file_format = "ndjson" if filename.endswith((".ndjson", ".jsonl")) else "csv"
+
+    # Rows are parsed straight off the spooled upload and written in batches
+    result = await import_transactions(db, portfolio_id, file.file, file_format)
+    await file.close()
+    # Batches commit as they go, so the version is bumped even when the import stopped early
+    await bump_portfolio_version(db, current_user.id, portfolio_id)
+    await db.commit()
+
+    if result.opened:
+        await price_stream.track(sorted(result.opened))
+    if result.closed:
+        await price_stream.untrack(sorted(result.closed))
+    return result.as_dict()
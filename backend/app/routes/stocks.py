@@ -1,12 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.core.deps import get_db, get_current_user
+from datetime import date, timedelta
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.deps import Principal, get_db, get_current_user
+from app.core.candles import PERIOD_SECONDS, candles_to_dict, get_candles
+from app.core.config import settings
 from app.core.finnhub_client import get_stock_quote, search_stocks
-from app.models.user import User
+from app.core.fundamentals import get_fundamentals
+from app.core.http_cache import etag_matches, not_modified
+from app.core.news import news_feed
+from app.core.price_stream import price_stream
+from app.core.serialization import FastJSONResponse
+from app.core.symbols import is_valid_symbol, normalize_symbol, symbol_index
+from app.core.valuation import fetch_quotes
+from app.core.versions import bump_watchlist_version, user_versions, version_etag
 from app.models.watchlist import Watchlist
 from app.schemas.watchlist import WatchlistItemCreate, WatchlistItem
-import httpx
-from app.core.config import settings
 
 router = APIRouter()
 
@@ -26,8 +36,38 @@ async def get_quote(symbol: str):
             detail=str(e)
         )
 
+@router.get("/quotes")
+async def get_quotes(
+    symbols: str,
+    current_user: Principal = Depends(get_current_user)
+):
+    requested = list(dict.fromkeys(s.strip() for s in symbols.split(",") if s.strip()))
+    if not requested:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No symbols given"
+        )
+    if len(requested) > settings.BATCH_QUOTE_MAX_SYMBOLS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many symbols (max {settings.BATCH_QUOTE_MAX_SYMBOLS})"
+        )
+
+    quotes, errors = await fetch_quotes(requested)
+    # Failed symbols carry an "error" key, the same shape Finnhub uses
+    return {
+        symbol: quotes[symbol] if symbol in quotes else {"error": errors[symbol]}
+        for symbol in requested
+    }
+
 @router.get("/search")
-async def search_stock(q: str):
+async def search_stock(q: str, request: Request):
+    if symbol_index.loaded:
+        if settings.FAST_SERIALIZATION:
+            return FastJSONResponse(
+                symbol_index.search(q), accept_encoding=request.headers.get("accept-encoding", "")
+            )
+        return symbol_index.search(q)
     try:
         results = await search_stocks(q)
         return results
@@ -40,22 +80,25 @@ async def search_stock(q: str):
 @router.post("/watchlist", response_model=WatchlistItem)
 async def add_to_watchlist(
     item: WatchlistItemCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    # Verify stock exists
-    quote = await get_stock_quote(item.symbol)
-    if quote.get('error'):
+    # Stored in canonical form so "aapl" and "AAPL" are one entry
+    item.symbol = normalize_symbol(item.symbol)
+    # Verify stock exists (local symbol index; no quote call needed)
+    if not await is_valid_symbol(item.symbol):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid stock symbol"
         )
     
     # Check if already in watchlist
-    existing = db.query(Watchlist).filter(
-        Watchlist.user_id == current_user.id,
-        Watchlist.symbol == item.symbol
-    ).first()
+    existing = await db.scalar(
+        select(Watchlist).filter(
+            Watchlist.user_id == current_user.id,
+            Watchlist.symbol == item.symbol
+        ).limit(1)
+    )
     
     if existing:
         raise HTTPException(
@@ -68,27 +111,41 @@ async def add_to_watchlist(
         symbol=item.symbol
     )
     db.add(watchlist_item)
-    db.commit()
-    db.refresh(watchlist_item)
+    await bump_watchlist_version(db, current_user.id)
+    await db.commit()
+    await db.refresh(watchlist_item)
+    await price_stream.track([watchlist_item.symbol])
     return watchlist_item
 
 @router.get("/watchlist", response_model=list[WatchlistItem])
 async def get_watchlist(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    return db.query(Watchlist).filter(Watchlist.user_id == current_user.id).all()
+    _, watchlist_version = await user_versions(db, current_user.id)
+    etag = version_etag("watchlist", current_user.id, watchlist_version)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, cache_control="private, no-cache")
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    result = await db.scalars(select(Watchlist).filter(Watchlist.user_id == current_user.id))
+    return result.all()
 
 @router.delete("/watchlist/{symbol}")
 async def remove_from_watchlist(
     symbol: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    watchlist_item = db.query(Watchlist).filter(
-        Watchlist.user_id == current_user.id,
-        Watchlist.symbol == symbol
-    ).first()
+    symbol = normalize_symbol(symbol)
+    watchlist_item = await db.scalar(
+        select(Watchlist).filter(
+            Watchlist.user_id == current_user.id,
+            Watchlist.symbol == symbol
+        ).limit(1)
+    )
     
     if not watchlist_item:
         raise HTTPException(
@@ -96,22 +153,98 @@ async def remove_from_watchlist(
             detail="Stock not found in watchlist"
         )
     
-    db.delete(watchlist_item)
-    db.commit()
+    await db.delete(watchlist_item)
+    await bump_watchlist_version(db, current_user.id)
+    await db.commit()
+    await price_stream.untrack([symbol])
     return {"message": "Stock removed from watchlist"}
 
 @router.get("/market-news")
 async def get_market_news(
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    category: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    if_none_match: Optional[str] = Header(None),
+    current_user: Principal = Depends(get_current_user)
 ):
     try:
-        url = f"https://finnhub.io/api/v1/news?category=general&token={settings.FINNHUB_API_KEY}"
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
-            response.raise_for_status()
-            return response.json()
+        await news_feed.ensure_loaded()
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to fetch market news: {str(e)}"
         )
+    # The feed is identical for everyone, so its version tags every page of it
+    etag = f'"news-{news_feed.version}"'
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    if settings.FAST_SERIALIZATION:
+        return FastJSONResponse(
+            news_feed.page(category, offset, limit),
+            headers=dict(response.headers),
+            accept_encoding=request.headers.get("accept-encoding", "")
+        )
+    return news_feed.page(category, offset, limit)
+
+@router.get("/{symbol}/candles")
+async def get_stock_candles(
+    symbol: str,
+    resolution: str = Query("D", pattern=f"^({'|'.join(PERIOD_SECONDS)})$"),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_user: Principal = Depends(get_current_user)
+):
+    # Unknown symbols never reach upstream or the candle store
+    if not await is_valid_symbol(symbol):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Stock not found"
+        )
+    end = end or date.today()
+    start = start or end - timedelta(days=365)
+    if start > end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must not be after end"
+        )
+    try:
+        candles = await get_candles(symbol, resolution, start, end)
+    except ValueError:
+        # The candle store refuses symbols that are not safe as directory names
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Stock not found"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"Failed to fetch candles: {str(e)}"
+        )
+    # Same column-oriented shape as Finnhub's /stock/candle
+    return {"s": "ok" if len(candles) else "no_data", **candles_to_dict(candles)}
+
+@router.get("/{symbol}/fundamentals")
+async def get_stock_fundamentals(
+    symbol: str,
+    response: Response,
+    current_user: Principal = Depends(get_current_user)
+):
+    # Unknown symbols never reach upstream or the disk cache
+    if not await is_valid_symbol(symbol):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Stock not found"
+        )
+    try:
+        fundamentals, age = await get_fundamentals(symbol)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"Failed to fetch fundamentals: {str(e)}"
+        )
+    response.headers["Age"] = str(int(age))
+    return {"symbol": symbol.upper(), **fundamentals}
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -15,6 +15,8 @@ class StockCreate(StockBase):
 class Stock(StockBase):
     id: int
     portfolio_id: int
+    average_cost: Optional[float] = None
+    updated_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -27,7 +29,7 @@ class TransactionBase(BaseModel):
 
 
 class TransactionCreate(TransactionBase):
-    pass
+    lot_method: Optional[str] = None  # Lot matching for sells; defaults to settings.LOT_METHOD
 
 
 class Transaction(TransactionBase):
@@ -40,6 +42,11 @@ class Transaction(TransactionBase):
         from_attributes = True
 
 
+class TransactionPage(BaseModel):
+    items: List[Transaction]
+    next_cursor: Optional[str] = None
+
+
 class PortfolioBase(BaseModel):
     name: str
 
@@ -56,3 +63,15 @@ class Portfolio(PortfolioBase):
 
     class Config:
         from_attributes = True
+
+
+class TaxLot(BaseModel):
+    id: int
+    symbol: str
+    quantity: float
+    remaining: float
+    cost_per_share: float
+    opened_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,100 @@
+"""Login throughput and event-loop responsiveness under a login burst.
+
+Run from the backend directory:
+
+    python benchmarks/login_throughput.py --logins 200 --concurrency 50
+
+Uses a throwaway SQLite database. While the logins run, a cheap endpoint is
+polled; its latency shows whether bcrypt is stalling the event loop.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def configure(args):
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("FINNHUB_API_KEY", "benchmark")
+    os.environ["PRICE_STREAM_ENABLED"] = "false"
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+    os.environ["PASSWORD_HASH_EXECUTOR"] = args.executor
+    os.environ["PASSWORD_HASH_MAX_QUEUE"] = "0"
+
+
+async def run(args):
+    import httpx
+    from main import app
+    from app.core.database import async_engine
+    from app.core.migrations import run_migrations
+    from app.core.security import password_hash_pool
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(run_migrations)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post(
+            "/auth/register",
+            json={"username": "bench", "email": "bench@example.com", "password": "bench-password"}
+        )
+        response.raise_for_status()
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+        done = asyncio.Event()
+
+        async def login():
+            async with semaphore:
+                response = await client.post(
+                    "/auth/login", json={"username": "bench", "password": "bench-password"}
+                )
+                response.raise_for_status()
+
+        async def probe(latencies):
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/")
+                latencies.append((time.perf_counter() - started) * 1000)
+                await asyncio.sleep(0.01)
+
+        latencies = []
+        probe_task = asyncio.create_task(probe(latencies))
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(args.logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+    await async_engine.dispose()
+    password_hash_pool.shutdown()
+
+    latencies.sort()
+    print(f"executor={args.executor} workers={args.workers} rounds={args.rounds}")
+    print(f"{args.logins} logins in {elapsed:.2f}s -> {args.logins / elapsed:.1f} logins/s")
+    if latencies:
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(
+            f"probe GET / during burst: n={len(latencies)} "
+            f"p50={statistics.median(latencies):.1f}ms p99={p99:.1f}ms max={latencies[-1]:.1f}ms"
+        )
+    print(f"pool: {password_hash_pool.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread")
+    parser.add_argument("--rounds", type=int, default=12)
+    args = parser.parse_args()
+    configure(args)
+    asyncio.run(run(args))
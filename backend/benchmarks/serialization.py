@@ -0,0 +1,126 @@
+"""Serialization throughput of GET /portfolios/ for a portfolio with many transactions.
+
+Run from the backend directory:
+
+    python benchmarks/serialization.py --transactions 10000 --requests 20
+
+Uses a throwaway SQLite database. Each mode is timed over the same data:
+"default" is the ORM + response_model path, "fast" sets FAST_SERIALIZATION
+(column tuples + orjson when installed). Each mode is then repeated with
+gzip and, if the brotli package is installed, br. Throughput is measured in
+uncompressed JSON bytes per second.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def configure(args):
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("FINNHUB_API_KEY", "benchmark")
+    os.environ["PRICE_STREAM_ENABLED"] = "false"
+    os.environ["SYMBOL_INDEX_ENABLED"] = "false"
+    os.environ["NEWS_REFRESH_ENABLED"] = "false"
+    os.environ["COMPRESSION_ENABLED"] = "true"
+
+
+async def seed(transactions: int) -> int:
+    from sqlalchemy import insert
+    from app.core.database import AsyncSessionLocal
+    from app.models.portfolio import Portfolio, Stock, Transaction
+    from app.models.user import User
+
+    symbols = ["AAPL", "MSFT", "GOOGL", "AMZN", "NVDA", "META", "TSLA", "JPM"]
+    started = datetime(2020, 1, 1)
+    async with AsyncSessionLocal() as db:
+        user = User(username="bench", email="bench@example.com", hashed_password="x")
+        db.add(user)
+        await db.flush()
+        portfolio = Portfolio(name="bench", user_id=user.id)
+        db.add(portfolio)
+        await db.flush()
+        await db.execute(insert(Transaction), [
+            {
+                "portfolio_id": portfolio.id,
+                "symbol": symbols[i % len(symbols)],
+                "quantity": 1.0 + i % 7,
+                "type": "BUY",
+                "price": 100.0 + i % 50,
+                "timestamp": started + timedelta(minutes=i)
+            }
+            for i in range(transactions)
+        ])
+        await db.execute(insert(Stock), [
+            {"portfolio_id": portfolio.id, "symbol": symbol, "quantity": 10.0, "average_cost": 100.0}
+            for symbol in symbols
+        ])
+        await db.commit()
+        return user.id
+
+
+async def run(args):
+    import httpx
+    from main import app
+    from app.core import serialization
+    from app.core.config import settings
+    from app.core.database import async_engine
+    from app.core.migrations import run_migrations
+    from app.core.security import create_access_token
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(run_migrations)
+    user_id = await seed(args.transactions)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user_id)})}"}
+
+    encodings = ["identity", "gzip"] + (["br"] if serialization.brotli is not None else [])
+    print(f"{args.transactions} transactions, {args.requests} requests per mode, "
+          f"orjson={'yes' if serialization.orjson is not None else 'no'}")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        baseline = None
+        for fast in (False, True):
+            settings.FAST_SERIALIZATION = fast
+            for encoding in encodings:
+                request_headers = {**headers, "Accept-Encoding": encoding}
+                # Warm-up, and the uncompressed size the throughput is measured in
+                response = await client.get("/portfolios/", headers=request_headers)
+                response.raise_for_status()
+                body = response.content
+                if baseline is None:
+                    baseline = body
+                elif body != baseline:
+                    print("  warning: response body differs from the default path")
+                wire_bytes = int(response.headers.get("content-length", len(body)))
+
+                timings = []
+                for _ in range(args.requests):
+                    started = time.perf_counter()
+                    response = await client.get("/portfolios/", headers=request_headers)
+                    timings.append(time.perf_counter() - started)
+                median = statistics.median(timings)
+                print(
+                    f"{'fast' if fast else 'default':8} {encoding:9} "
+                    f"median={median * 1000:7.1f}ms  json={len(body) / 1e6:5.2f}MB  wire={wire_bytes / 1e6:5.2f}MB  "
+                    f"{len(body) / median / 1e6:7.1f} MB/s"
+                )
+
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transactions", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+    configure(args)
+    asyncio.run(run(args))
@@ -1,12 +1,25 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 import os
-from app.core.database import database
-from app.routes import auth, users, portfolio, stocks, analytics
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, async_engine
+from app.core import finnhub_client
+from app.core.metrics import MetricsMiddleware, instrument_engine
+from app.core.migrations import run_migrations
+from app.core.news import news_feed
+from app.core.price_stream import price_stream, tracked_symbol_counts
+from app.core.security import password_hash_pool
+from app.core.serialization import FastJSONResponse
+from app.core.symbols import symbol_index_refresher
+from app.routes import auth, users, portfolio, stocks, analytics, metrics
 
-app = FastAPI(title="CSC 478 Capstone Group 6 API")
+app = FastAPI(
+    title="CSC 478 Capstone Group 6 API",
+    default_response_class=FastJSONResponse if settings.FAST_SERIALIZATION else JSONResponse
+)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
@@ -20,15 +33,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Bodies FastJSONResponse already brotli-compressed carry Content-Encoding and pass through untouched
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        GZipMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        compresslevel=settings.GZIP_LEVEL
+    )
+
+# Outermost, so latency includes the other middleware; app.routes is read at request time
+if settings.METRICS_ENABLED:
+    instrument_engine(async_engine)
+    app.add_middleware(MetricsMiddleware, routes=app.routes)
+
 
 @app.on_event("startup")
 async def startup():
-    await database.connect()
+    async with async_engine.begin() as conn:
+        await conn.run_sync(run_migrations)
+    await finnhub_client.init_client()
+    if settings.SYMBOL_INDEX_ENABLED:
+        await symbol_index_refresher.start()
+    if settings.NEWS_REFRESH_ENABLED:
+        await news_feed.start()
+    if settings.PRICE_STREAM_ENABLED:
+        async with AsyncSessionLocal() as db:
+            symbol_counts = await tracked_symbol_counts(db)
+        await price_stream.start(symbol_counts)
 
 
 @app.on_event("shutdown")
 async def shutdown():
-    await database.disconnect()
+    await price_stream.stop()
+    await symbol_index_refresher.stop()
+    await news_feed.stop()
+    await finnhub_client.close_client()
+    await async_engine.dispose()
+    password_hash_pool.shutdown()
 
 
 # Include routers
@@ -37,6 +78,8 @@ app.include_router(users.router, prefix="/users", tags=["users"])
 app.include_router(portfolio.router, prefix="/portfolios", tags=["portfolios"])
 app.include_router(stocks.router, prefix="/stocks", tags=["stocks"])
 app.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
+if settings.METRICS_ENABLED:
+    app.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
 
 
 @app.get("/")
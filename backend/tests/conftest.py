@@ -0,0 +1,40 @@
+import os
+import tempfile
+
+# Settings are read at import time, so the environment is set before any app module loads
+_data_dir = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_data_dir, 'test.db')}"
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("FINNHUB_API_KEY", "test")
+os.environ["FINNHUB_BASE_URL"] = "http://127.0.0.1:9/api/v1"
+os.environ["PRICE_STREAM_ENABLED"] = "false"
+os.environ["SYMBOL_INDEX_ENABLED"] = "false"
+os.environ["NEWS_REFRESH_ENABLED"] = "false"
+os.environ["CANDLE_STORE_DIR"] = os.path.join(_data_dir, "candles")
+os.environ["FUNDAMENTALS_CACHE_DIR"] = os.path.join(_data_dir, "fundamentals")
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="session")
+def client():
+    from main import app
+    # Entering the client runs the startup hooks, which migrate the database
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def user(client):
+    from app.core.database import SessionLocal
+    from app.core.security import create_access_token
+    from app.models.user import User
+
+    with SessionLocal() as db:
+        count = db.query(User).count()
+        user = User(username=f"user{count}", email=f"user{count}@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user.id)})}"}
+        return user.id, headers
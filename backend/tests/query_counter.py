@@ -0,0 +1,31 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(bind=None):
+    # Counts SQL statements issued on the engine, e.g. to assert a route stays free of N+1 loads:
+    #     with count_queries() as queries: ...
+    #     assert queries.count <= 4, queries.statements
+    from app.core.database import async_engine
+
+    bind = bind or async_engine
+    sync_engine = getattr(bind, "sync_engine", bind)
+    counter = QueryCounter()
+    event.listen(sync_engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", counter)
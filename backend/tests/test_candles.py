@@ -0,0 +1,34 @@
+import asyncio
+import os
+import time
+from app.core import candles
+from app.core.candles import CandleStore
+
+
+def test_store_keeps_a_bounded_number_of_series_mapped(monkeypatch, tmp_path):
+    now = int(time.time())
+
+    async def fake_candles(symbol, resolution, start, end):
+        return {"s": "ok", "t": [now - 7 * 86400], "o": [1.0], "h": [1.0], "l": [1.0], "c": [1.0], "v": [1.0]}
+
+    monkeypatch.setattr(candles, "get_stock_candles", fake_candles)
+    store = CandleStore(str(tmp_path), maxsize=4)
+
+    def open_files():
+        return len(os.listdir("/proc/self/fd"))
+
+    async def main():
+        for i in range(20):
+            await store.get_range(f"SYM{i}", "D", now - 30 * 86400, now)
+        for i in range(20):
+            store.read(f"SYM{i}", "D", now - 30 * 86400, now)
+
+    before = open_files()
+    asyncio.run(main())
+
+    assert len(store._arrays) == 4
+    assert len(store._coverage) <= 4
+    assert len(store._tail) <= 4
+    assert len(store._locks) == 0
+    assert open_files() - before <= 4
+    assert store.read("SYM0", "D", now - 30 * 86400, now)["c"].tolist() == [1.0]
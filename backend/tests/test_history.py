@@ -0,0 +1,65 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import numpy as np
+from sqlalchemy import select
+from app.core import history, transaction_import
+from app.core.candles import to_epoch
+
+
+def test_import_invalidation_is_not_overwritten_by_a_running_extension(client, user, monkeypatch):
+    from app.core.database import SessionLocal
+    from app.models.portfolio import PortfolioSnapshot
+
+    loading = threading.Event()
+
+    async def valid_symbol(symbol):
+        return True
+
+    async def closes(symbols, start, end):
+        # Hold the extension between reading trades and persisting, where the import lands
+        loading.set()
+        await asyncio.sleep(0.3)
+        return [(np.array([to_epoch(start)]), np.array([100.0])) for _ in symbols]
+
+    monkeypatch.setattr(transaction_import, "is_valid_symbol", valid_symbol)
+    monkeypatch.setattr(history, "load_closes", closes)
+
+    _, headers = user
+    portfolio_id = client.post("/portfolios/", json={"name": "History", "stocks": []}, headers=headers).json()["id"]
+
+    def upload(symbol, days_ago):
+        timestamp = (date.today() - timedelta(days=days_ago)).isoformat()
+        body = f"symbol,quantity,price,type,timestamp\n{symbol},1,100,BUY,{timestamp}T12:00:00\n"
+        return client.post(
+            f"/portfolios/{portfolio_id}/transactions/import",
+            files={"file": ("trades.csv", body, "text/csv")},
+            headers=headers
+        )
+
+    assert upload("AAPL", 10).json()["imported"] == 1
+
+    def back_dated_import():
+        loading.wait(5)
+        return upload("MSFT", 5)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        extension = pool.submit(client.get, f"/analytics/portfolio-history/{portfolio_id}", headers=headers)
+        imported = pool.submit(back_dated_import)
+        assert extension.result().status_code == 200
+        assert imported.result().json()["imported"] == 1
+
+    since = date.today() - timedelta(days=5)
+    with SessionLocal() as db:
+        stale = [
+            snapshot.date
+            for snapshot in db.scalars(
+                select(PortfolioSnapshot).filter(
+                    PortfolioSnapshot.portfolio_id == portfolio_id,
+                    PortfolioSnapshot.date >= since
+                )
+            )
+            if "MSFT" not in (snapshot.holdings or {})
+        ]
+    assert stale == []
@@ -0,0 +1,63 @@
+import pytest
+from sqlalchemy import create_engine
+from app.core.migrations import HOT_QUERIES, explain_hot_queries, run_migrations
+
+
+@pytest.fixture(scope="module")
+def migrated_engine(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('migrations') / 'explain.db'}")
+    with engine.begin() as conn:
+        run_migrations(conn)
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.parametrize("name", list(HOT_QUERIES))
+def test_hot_query_uses_an_index(migrated_engine, name):
+    with migrated_engine.connect() as conn:
+        uses_index, details = explain_hot_queries(conn)[name]
+    assert uses_index, details
+    assert not any(detail.startswith("SCAN") for detail in details), details
+    assert any("USING" in detail and "INDEX" in detail for detail in details), details
+
+
+def test_hot_queries_cover_every_lot_method():
+    from app.core.positions import LOT_METHODS
+
+    assert {f"open lots {name}" for name in LOT_METHODS} <= set(HOT_QUERIES)
+
+
+def test_reconcile_matches_lots_to_legacy_positions(tmp_path):
+    from sqlalchemy import text
+    from app.core.migrations import _reconcile_tax_lots
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        run_migrations(conn)
+        conn.execute(text("INSERT INTO users (id, email, hashed_password) VALUES (1, 'a@b.c', 'x')"))
+        conn.execute(text("INSERT INTO portfolios (id, name, user_id) VALUES (1, 'legacy', 1)"))
+        # A position with no transactions, one the replay overstates and lots with no position left
+        conn.execute(text(
+            "INSERT INTO stocks (portfolio_id, symbol, quantity, average_cost) VALUES"
+            " (1, 'VOO', 50, 0), (1, 'AAPL', 3, 0)"
+        ))
+        conn.execute(text(
+            "INSERT INTO transactions (portfolio_id, symbol, quantity, price, type, timestamp) VALUES"
+            " (1, 'VOO', -1, 400, 'SELL', '2024-01-02 00:00:00')"
+        ))
+        conn.execute(text(
+            "INSERT INTO tax_lots (portfolio_id, symbol, quantity, remaining, cost_per_share, opened_at) VALUES"
+            " (1, 'AAPL', 5, 5, 100, '2024-01-01 00:00:00'), (1, 'AAPL', 5, 5, 200, '2024-01-03 00:00:00'),"
+            " (1, 'MSFT', 15, 15, 300, '2024-01-01 00:00:00')"
+        ))
+        _reconcile_tax_lots(conn)
+        _reconcile_tax_lots(conn)
+
+        open_lots = dict(conn.execute(text(
+            "SELECT symbol, SUM(remaining) FROM tax_lots WHERE remaining > 0 GROUP BY symbol"
+        )).all())
+        average_costs = dict(conn.execute(text("SELECT symbol, average_cost FROM stocks")).all())
+    engine.dispose()
+
+    assert open_lots == {"AAPL": 3, "VOO": 50}
+    assert average_costs == {"AAPL": 200, "VOO": 400}
@@ -0,0 +1,26 @@
+import asyncio
+from app.core import news
+from app.core.news import NewsFeed
+
+
+def test_cold_readers_back_off_while_upstream_is_down(monkeypatch):
+    calls = []
+
+    async def failing_news(category):
+        calls.append(category)
+        raise RuntimeError("upstream down")
+
+    monkeypatch.setattr(news, "get_market_news", failing_news)
+    feed = NewsFeed(["general"], maxlen=10, interval=300.0, retry_delay=60.0)
+
+    async def read():
+        try:
+            await feed.ensure_loaded()
+        except RuntimeError as e:
+            return str(e)
+
+    async def main():
+        return [await read() for _ in range(5)]
+
+    assert asyncio.run(main()) == ["upstream down"] * 5
+    assert calls == ["general"]
@@ -0,0 +1,43 @@
+from sqlalchemy import insert
+from tests.query_counter import count_queries
+
+
+def _add_portfolios(user_id: int, count: int):
+    from app.core.database import SessionLocal
+    from app.models.portfolio import Portfolio, Stock, Transaction
+
+    with SessionLocal() as db:
+        for i in range(count):
+            portfolio = Portfolio(name=f"Portfolio {i}", user_id=user_id)
+            db.add(portfolio)
+            db.flush()
+            db.execute(insert(Stock), [
+                {"portfolio_id": portfolio.id, "symbol": symbol, "quantity": 1.0, "average_cost": 10.0}
+                for symbol in ("AAPL", "MSFT")
+            ])
+            db.execute(insert(Transaction), [
+                {"portfolio_id": portfolio.id, "symbol": "AAPL", "quantity": 1.0, "type": "BUY", "price": 10.0}
+            ])
+        db.commit()
+
+
+def _statements_for_list(client, headers) -> tuple:
+    with count_queries() as queries:
+        response = client.get("/portfolios/", headers=headers)
+    assert response.status_code == 200
+    return queries.count, len(response.json())
+
+
+def test_list_portfolios_query_count_does_not_grow_with_portfolios(client, user):
+    user_id, headers = user
+    _add_portfolios(user_id, 1)
+    # Warm the principal cache so both measurements see the same authentication path
+    client.get("/portfolios/", headers=headers)
+
+    few, returned = _statements_for_list(client, headers)
+    assert returned == 1
+
+    _add_portfolios(user_id, 9)
+    many, returned = _statements_for_list(client, headers)
+    assert returned == 10
+    assert many == few
@@ -0,0 +1,15 @@
+from app.core.symbols import SymbolIndex
+
+
+def test_index_matches_symbols_whatever_the_upstream_casing(tmp_path):
+    index = SymbolIndex(str(tmp_path / "symbols.json"), "US")
+    index.load([
+        {"symbol": "aapl", "description": "Apple Inc"},
+        {"symbol": " BRK.b ", "description": "Berkshire Hathaway Inc"},
+    ])
+
+    assert "AAPL" in index
+    assert "aapl" in index
+    assert "brk.b" in index
+    assert " BRK.B" in index
+    assert [entry["symbol"] for entry in index.search("brk")["result"]] == ["BRK.B"]
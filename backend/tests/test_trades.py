@@ -0,0 +1,133 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from sqlalchemy import func, select
+from app.routes import portfolio as portfolio_routes
+
+
+@pytest.fixture
+def quotes(monkeypatch):
+    async def valid_symbol(symbol):
+        return True
+
+    async def quote(symbol):
+        # Yield like a real upstream call, so concurrent requests interleave here
+        await asyncio.sleep(0.01)
+        return {"c": 100.0, "pc": 99.0, "t": 1}
+
+    monkeypatch.setattr(portfolio_routes, "is_valid_symbol", valid_symbol)
+    monkeypatch.setattr(portfolio_routes, "get_stock_quote", quote)
+
+
+@pytest.fixture
+def portfolio_id(client, user, quotes):
+    _, headers = user
+    response = client.post("/portfolios/", json={"name": "Trades", "stocks": []}, headers=headers)
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def _trade(client, headers, portfolio_id, **transaction):
+    return client.post(f"/portfolios/{portfolio_id}/transaction", json=transaction, headers=headers)
+
+
+def test_concurrent_sells_cannot_oversell(client, user, portfolio_id):
+    from app.core.database import SessionLocal
+    from app.models.portfolio import LotDisposal, Stock
+
+    _, headers = user
+    assert _trade(client, headers, portfolio_id, symbol="AAPL", quantity=10, type="BUY").status_code == 200
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        responses = list(pool.map(
+            lambda _: _trade(client, headers, portfolio_id, symbol="AAPL", quantity=10, type="SELL"),
+            range(5)
+        ))
+
+    assert sorted(response.status_code for response in responses) == [200, 400, 400, 400, 400]
+    with SessionLocal() as db:
+        assert db.scalar(select(func.count()).select_from(Stock).filter(Stock.portfolio_id == portfolio_id)) == 0
+        disposals = db.scalar(
+            select(func.count()).select_from(LotDisposal).filter(LotDisposal.portfolio_id == portfolio_id)
+        )
+        assert disposals == 1
+
+
+@pytest.mark.parametrize("transaction", [
+    {"symbol": "AAPL", "quantity": -5, "type": "SELL"},
+    {"symbol": "AAPL", "quantity": 0, "type": "BUY"},
+    {"symbol": "AAPL", "quantity": 5, "type": "HOLD"},
+])
+def test_invalid_transactions_are_rejected(client, user, portfolio_id, transaction):
+    _, headers = user
+    response = _trade(client, headers, portfolio_id, **transaction)
+    assert response.status_code == 400
+    lots = client.get(f"/portfolios/{portfolio_id}/lots", headers=headers)
+    assert lots.status_code == 200
+    assert lots.json() == []
+
+
+def test_create_portfolio_with_non_positive_quantity_writes_nothing(client, user, quotes):
+    _, headers = user
+    response = client.post(
+        "/portfolios/",
+        json={"name": "Rejected", "stocks": [{"symbol": "AAPL", "quantity": 0}]},
+        headers=headers
+    )
+    assert response.status_code == 400
+    names = [portfolio["name"] for portfolio in client.get("/portfolios/", headers=headers).json()]
+    assert "Rejected" not in names
+
+
+def test_symbols_are_stored_in_canonical_form(client, user, portfolio_id):
+    _, headers = user
+    assert _trade(client, headers, portfolio_id, symbol="AAPL", quantity=5, type="BUY").status_code == 200
+    response = _trade(client, headers, portfolio_id, symbol=" aapl ", quantity=5, type="BUY")
+    assert response.status_code == 200
+    assert response.json()["symbol"] == "AAPL"
+
+    portfolio = client.get(f"/portfolios/{portfolio_id}", headers=headers).json()
+    assert [(stock["symbol"], stock["quantity"]) for stock in portfolio["stocks"]] == [("AAPL", 10.0)]
+    lots = client.get(f"/portfolios/{portfolio_id}/lots", params={"symbol": "aapl"}, headers=headers)
+    assert len(lots.json()) == 2
+
+
+def test_import_reports_the_net_change_in_held_symbols(client, user, portfolio_id, monkeypatch):
+    from app.core import transaction_import
+    from app.core.config import settings
+
+    async def valid_symbol(symbol):
+        return True
+
+    subscriptions = []
+
+    async def track(symbols):
+        subscriptions.append(("track", sorted(symbols)))
+
+    async def untrack(symbols):
+        subscriptions.append(("untrack", sorted(symbols)))
+
+    monkeypatch.setattr(transaction_import, "is_valid_symbol", valid_symbol)
+    monkeypatch.setattr(portfolio_routes.price_stream, "track", track)
+    monkeypatch.setattr(portfolio_routes.price_stream, "untrack", untrack)
+    # One row per batch, so each symbol changes state across several batches
+    monkeypatch.setattr(settings, "IMPORT_BATCH_SIZE", 1)
+
+    _, headers = user
+    assert _trade(client, headers, portfolio_id, symbol="AAPL", quantity=1, type="BUY").status_code == 200
+    subscriptions.clear()
+
+    rows = [
+        ("AAPL", "SELL"), ("AAPL", "BUY"), ("AAPL", "SELL"),
+        ("MSFT", "BUY"), ("MSFT", "SELL"), ("MSFT", "BUY"),
+        ("NVDA", "BUY"), ("NVDA", "SELL"),
+    ]
+    body = "symbol,quantity,price,type\n" + "".join(f"{symbol},1,100,{kind}\n" for symbol, kind in rows)
+    response = client.post(
+        f"/portfolios/{portfolio_id}/transactions/import",
+        files={"file": ("trades.csv", body, "text/csv")},
+        headers=headers
+    )
+
+    assert response.json()["imported"] == len(rows)
+    assert subscriptions == [("track", ["MSFT"]), ("untrack", ["AAPL"])]
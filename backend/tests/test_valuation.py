@@ -0,0 +1,22 @@
+import asyncio
+from app.core import valuation
+from app.core.symbols import symbol_index
+
+
+def test_zero_and_unknown_quotes_are_errors(monkeypatch):
+    requested = []
+
+    async def quote(symbol):
+        requested.append(symbol)
+        if symbol == "DELISTED":
+            return {"c": 0, "d": None, "dp": None, "h": 0, "l": 0, "o": 0, "pc": 0, "t": 0}
+        return {"c": 100.0, "pc": 99.0, "t": 1700000000}
+
+    monkeypatch.setattr(valuation, "get_stock_quote", quote)
+    monkeypatch.setattr(symbol_index, "_entries", {"AAPL": {}, "DELISTED": {}})
+
+    quotes, errors = asyncio.run(valuation.fetch_quotes(["AAPL", "DELISTED", "NOPE", "AAPL"]))
+
+    assert list(quotes) == ["AAPL"]
+    assert set(errors) == {"DELISTED", "NOPE"}
+    assert sorted(requested) == ["AAPL", "DELISTED"]